@@ -1,18 +1,27 @@
 import requests
+import threading
 import time
-import json
+from ingest import MarketIngestor
+from registry import MarketRegistry, LRURegistry
+from transport import Transport, REQUEST_TIMEOUT
+from decode import decode_response, project, project_poly_events, project_kalshi_markets, POLY_MARKET_FIELDS
 
 # rate limiting constants
 KALSHI_RATE_LIMIT = 1/19
 POLY_RATE_LIMIT = 1/10
-REQUEST_TIMEOUT = 10
+# kalshi allows up to 1000 markets per page
+KALSHI_MARKET_PAGE_LIMIT = 1000
 
 
 class PolyExtractor:
-    def __init__(self):
+    def __init__(self, transport=None, registry=None, lock=None):
         self.BASE = "https://gamma-api.polymarket.com"
-        self.title_to_markets = {}
-        self.session = requests.Session()
+        # may be shared with the kalshi extractor and the engine, keys carry the exchange
+        self.markets = registry if registry is not None else MarketRegistry()
+        # guards the ingestor and registry, quotes are refreshed while discovery runs
+        self.lock = lock if lock is not None else threading.RLock()
+        self.session = transport if transport is not None else Transport()
+        self.ingestor = MarketIngestor()
 
     def get_tag_id(self, tag_name: str):
         try:
@@ -37,6 +46,7 @@ class PolyExtractor:
         if tag_name:
             tag_id = self.get_tag_id(tag_name)
             if tag_id is None:
+                self.ingestor.mark_incomplete()
                 return []
             event_params["tag_id"] = tag_id
 
@@ -49,65 +59,89 @@ class PolyExtractor:
                     timeout=REQUEST_TIMEOUT
                 )
                 response.raise_for_status()
-                events = response.json()
-            except requests.exceptions.RequestException as e:
-                print(f"[ERROR] Failed to fetch events: {e}")
+                events = decode_response(response)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"[ERROR] Failed to fetch events, returning partial results: {e}")
+                self.ingestor.mark_incomplete()
                 break
 
             if not events:
                 break
 
+            page_len = len(events)
+            events = project_poly_events(events)
+
+            # normalize each market once, as the page arrives
+            with self.lock:
+                for market in self.ingestor.ingest_poly_events(events):
+                    self.markets.add_live(market)
             all_events.extend(events)
 
-            if len(events) < limit:
+            if page_len < limit:
                 break
 
             event_params["offset"] = len(all_events)
             time.sleep(POLY_RATE_LIMIT)
 
-        for event in all_events:
-            markets = event.get('markets', [])
-            for market in markets:
-                self.title_to_markets[market["question"]] = market
-
         return all_events
 
     def get_markets(self, events):
         return events['markets']
 
+    def evict_expired(self, now=None):
+        # closed and expired markets, the caller removes them from the matcher
+        return self.markets.evict_expired(now, exchange="poly")
+
+    def registry_stats(self):
+        return {"markets": self.markets.stats()}
+
+    def refresh_market(self, market_id, event_id=''):
+        # single market quote refresh, hedged since it sits on the latency sensitive path
+        try:
+            response = self.session.get(
+                f"{self.BASE}/markets/{market_id}", timeout=REQUEST_TIMEOUT, hedge=True)
+            response.raise_for_status()
+            market = decode_response(response)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"[ERROR] Failed to refresh market {market_id}: {e}")
+            return None
+
+        with self.lock:
+            market = self.ingestor.ingest_poly_market(
+                project(market, POLY_MARKET_FIELDS), event_id)
+            self.markets.add_live(market)
+        return market
+
     def print_market(self, market):
         if not market:
             return
-        outcomes = json.loads(market.get("outcomes"))
-        outcome_prices = json.loads(market.get("outcomePrices"))
-        question = market.get("question")
-        if 1 not in outcome_prices:
-            print(f"Poly: {question}")
-            for outcome, price in zip(outcomes, outcome_prices):
-                print(f"{outcome}: {price}")
+        if market.yes_price != 1 and market.no_price != 1:
+            print(f"Poly: {market.title}")
+            print(f"Yes: {market.yes_price}")
+            print(f"No: {market.no_price}")
 
     # this assumes yes/no market
     # returns yes price, no price and link to market
     def get_market_yn_link(self, market):
         if not market:
             return None, None, None
-        outcome_prices = json.loads(market.get("outcomePrices"))
-        if not outcome_prices or len(outcome_prices) < 2:
+        if market.yes_price is None or market.no_price is None:
             return None, None, None
-        slug = market['slug']
-        if not slug:
+        if not market.link:
             return None, None, None
-        link = f"https://polymarket.com/market/{slug}"
-        return outcome_prices[0], outcome_prices[1], link
+        return market.yes_price, market.no_price, market.link
 
 
 class KalshiExtractor:
-    def __init__(self):
+    def __init__(self, transport=None, registry=None, lock=None):
         self.BASE = "https://api.elections.kalshi.com/trade-api/v2"
-        self.title_to_ticker = {}
-        self.title_to_markets = {}
-        self.event_to_series = {}
-        self.session = requests.Session()
+        self.title_to_ticker = LRURegistry()
+        self.markets = registry if registry is not None else MarketRegistry()
+        # guards the ingestor, registry and metadata, quotes are refreshed while discovery runs
+        self.lock = lock if lock is not None else threading.RLock()
+        self.event_to_series = LRURegistry()
+        self.session = transport if transport is not None else Transport()
+        self.ingestor = MarketIngestor()
 
     def get_series(self, category, tag):
         if tag is not None:
@@ -123,7 +157,9 @@ class KalshiExtractor:
                 response.raise_for_status()
                 series_data = response.json()
             except requests.exceptions.RequestException as e:
-                print(f"[ERROR] Failed to fetch series: {e}")
+                print(f"[ERROR] Failed to fetch series, returning partial results: {e}")
+                # markets of the series not listed would otherwise look delisted
+                self.ingestor.mark_incomplete()
                 break
 
             series = series_data.get("series", [])
@@ -136,41 +172,162 @@ class KalshiExtractor:
             series_params["cursor"] = cursor
             time.sleep(KALSHI_RATE_LIMIT)
 
-        for series in all_series:
-            self.title_to_ticker[series['title']] = series['ticker']
+        with self.lock:
+            for series in all_series:
+                self.title_to_ticker[series['title']] = series['ticker']
 
         return all_series
 
-    def get_markets(self, ticker, limit=100):
+    def _get_market_pages(self, market_params, label):
+        # follows the cursor until the listing is exhausted, ingesting each page as it arrives
+        market_params = dict(market_params)
+        all_markets = []
+        while True:
+            try:
+                response = self.session.get(
+                    f"{self.BASE}/markets", params=market_params, timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
+                markets_data = decode_response(response)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"[ERROR] Failed to fetch markets for {label}, returning partial results: {e}")
+                self.ingestor.mark_incomplete()
+                break
+
+            page = markets_data.get('markets', [])
+            with self.lock:
+                markets = self.ingestor.ingest_kalshi_markets(
+                    project_kalshi_markets(page))
+                for market in markets:
+                    self.markets.add_live(market)
+            all_markets.extend(markets)
+
+            cursor = markets_data.get("cursor")
+            time.sleep(KALSHI_RATE_LIMIT)
+            if not cursor or not page:
+                break
+            market_params["cursor"] = cursor
+
+        return all_markets
+
+    def evict_expired(self, now=None):
+        # closed and expired markets, the caller removes them from the matcher.
+        # events left without a live market lose their series mapping too
+        evicted = self.markets.evict_expired(now, exchange="kalshi")
+        for market in evicted:
+            if not self.markets.for_event(market.event_id):
+                self.event_to_series.pop(market.event_id, None)
+        return evicted
+
+    def registry_stats(self):
+        return {"markets": self.markets.stats(),
+                "title_to_ticker": self.title_to_ticker.stats(),
+                "event_to_series": self.event_to_series.stats()}
+
+    def get_markets(self, ticker, limit=KALSHI_MARKET_PAGE_LIMIT):
         market_params = {
             "series_ticker": ticker,
             "limit": limit,
             "status": "open"
         }
+        markets = self._get_market_pages(market_params, ticker)
+        # every market in this listing belongs to the requested series
+        with self.lock:
+            for market in markets:
+                if market.event_id:
+                    self.event_to_series.setdefault(market.event_id, ticker)
+        self.resolve_series(markets)
+        return markets
 
+    def get_markets_for_series(self, series_tickers, limit=KALSHI_MARKET_PAGE_LIMIT):
+        # returns series ticker -> markets, one paginated listing per series. /markets
+        # filters on a single series_ticker, and sweeping every open market to fan
+        # out locally costs more pages than it saves
+        series_to_markets = {}
+        for ticker in dict.fromkeys(series_tickers):
+            series_to_markets[ticker] = self.get_markets(ticker, limit)
+        return series_to_markets
+
+    def resolve_series(self, markets):
+        # resolves series and links for freshly ingested markets in bulk, so building
+        # pairs later never needs a per event request. the lock covers the metadata,
+        # never the prefetch's requests
+        with self.lock:
+            known_series = set(self.title_to_ticker.values())
+            unknown = set()
+            for market in markets:
+                event_ticker = market.event_id
+                if not event_ticker or event_ticker in self.event_to_series:
+                    continue
+                prefix = event_ticker.split('-')[0]
+                if prefix in known_series:
+                    self.event_to_series[event_ticker] = prefix
+                else:
+                    unknown.add(event_ticker)
+
+        if unknown:
+            self.prefetch_event_series(unknown)
+
+        with self.lock:
+            for market in markets:
+                series_ticker = self.event_to_series.get(market.event_id)
+                if series_ticker:
+                    market.link = f"https://kalshi.com/markets/{series_ticker.lower()}"
+
+    def prefetch_event_series(self, event_tickers, limit=200):
+        # one paginated sweep over open events instead of one /events/{ticker} call each
+        with self.lock:
+            remaining = set(event_tickers) - set(self.event_to_series)
+        event_params = {"limit": limit, "status": "open"}
+        while remaining:
+            try:
+                response = self.session.get(
+                    f"{self.BASE}/events", params=event_params, timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
+                events_data = decode_response(response)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"[ERROR] Failed to prefetch events: {e}")
+                break
+
+            with self.lock:
+                for event in events_data.get("events", []):
+                    event_ticker = event.get("event_ticker")
+                    series_ticker = event.get("series_ticker")
+                    if event_ticker and series_ticker:
+                        self.event_to_series[event_ticker] = series_ticker
+                        remaining.discard(event_ticker)
+
+            cursor = events_data.get("cursor")
+            time.sleep(KALSHI_RATE_LIMIT)
+            if not cursor:
+                break
+            event_params["cursor"] = cursor
+
+    def refresh_market(self, ticker):
+        # single market quote refresh, hedged since it sits on the latency sensitive path
         try:
             response = self.session.get(
-                f"{self.BASE}/markets", params=market_params, timeout=REQUEST_TIMEOUT)
+                f"{self.BASE}/markets/{ticker}", timeout=REQUEST_TIMEOUT, hedge=True)
             response.raise_for_status()
-            markets = response.json().get('markets', [])
-        except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Failed to fetch markets for {ticker}: {e}")
-            return []
-
-        time.sleep(KALSHI_RATE_LIMIT)
+            market = decode_response(response)["market"]
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            print(f"[ERROR] Failed to refresh market {ticker}: {e}")
+            return None
 
-        for market in markets:
-            title = f"{market['title']} {market.get('yes_sub_title', '')}"
-            self.title_to_markets[title.strip()] = market
-
-        return markets
+        with self.lock:
+            market = self.ingestor.ingest_kalshi_markets(
+                project_kalshi_markets([market]))[0]
+        # may page through /events, so it runs outside the lock
+        self.resolve_series([market])
+        with self.lock:
+            self.markets.add_live(market)
+        return market
 
     def print_market(self, market):
         if not market:
             return
-        print(f"Kalshi: {market['title']} {market['yes_sub_title']}")
-        print(f"yes ask: {market['yes_ask']}")
-        print(f"no ask: {market['no_ask']}")
+        print(f"Kalshi: {market.title}")
+        print(f"yes ask: {market.yes_price}")
+        print(f"no ask: {market.no_price}")
 
     def get_series_ticker_for_event(self, event_ticker):
         if event_ticker in self.event_to_series:
@@ -196,29 +353,22 @@ class KalshiExtractor:
         if not market:
             return None, None, None
 
-        event_ticker = market.get('event_ticker')
-        if not event_ticker:
-            return None, None, None
-        series_ticker = self.get_series_ticker_for_event(event_ticker)
-        if not series_ticker:
+        # series and link were resolved at ingest, no network here
+        if not market.event_id or not market.link:
             return None, None, None
 
-        link = f"https://kalshi.com/markets/{series_ticker.lower()}"
-
-        yes_ask = market.get('yes_ask')
-        no_ask = market.get('no_ask')
-
-        if yes_ask is None or no_ask is None:
+        if market.yes_price is None or market.no_price is None:
             return None, None, None
 
-        return yes_ask, no_ask, link
+        return market.yes_price, market.no_price, market.link
 
 
 class ArbitragePair:
+    # all prices are in dollars, as normalized at ingest
     def __init__(self, k_title, k_yes_price, k_no_price, k_link, p_title, p_yes_price, p_no_price, p_link):
         self.kalshi_title = k_title
-        self.kalshi_yes_price = float(k_yes_price)/100
-        self.kalshi_no_price = float(k_no_price)/100
+        self.kalshi_yes_price = float(k_yes_price)
+        self.kalshi_no_price = float(k_no_price)
         self.kalshi_link = k_link
 
         self.poly_title = p_title
@@ -226,12 +376,43 @@ class ArbitragePair:
         self.poly_no_price = float(p_no_price)
         self.poly_link = p_link
 
+        # stable exchange ids when built from Market records, titles otherwise
+        self.kalshi_id = k_title
+        self.poly_id = p_title
+
         # none for no, pk for yes poly and no kalshi, kp for yes kalshi no poly, both for both
         self.arbitrage = "none"
         self.edge = 0.0
         self.check_arb()
 
+    @classmethod
+    def from_markets(cls, k_market, p_market):
+        pair = cls(k_market.title, k_market.yes_price, k_market.no_price, k_market.link,
+                   p_market.title, p_market.yes_price, p_market.no_price, p_market.link)
+        pair.kalshi_id = k_market.market_id or k_market.title
+        pair.poly_id = p_market.market_id or p_market.title
+        return pair
+
+    @property
+    def pair_id(self):
+        return f"{self.kalshi_id}|{self.poly_id}"
+
+    def update_prices(self, kalshi_yes_price=None, kalshi_no_price=None,
+                      poly_yes_price=None, poly_no_price=None):
+        # in place quote update for one or both legs, then re-scores the pair
+        if kalshi_yes_price is not None:
+            self.kalshi_yes_price = float(kalshi_yes_price)
+        if kalshi_no_price is not None:
+            self.kalshi_no_price = float(kalshi_no_price)
+        if poly_yes_price is not None:
+            self.poly_yes_price = float(poly_yes_price)
+        if poly_no_price is not None:
+            self.poly_no_price = float(poly_no_price)
+        return self.check_arb()
+
     def check_arb(self):
+        self.arbitrage = "none"
+        self.edge = 0.0
         poly_yes_kalshi_no = self.poly_yes_price + self.kalshi_no_price
         kalshi_yes_poly_no = self.kalshi_yes_price + self.poly_no_price
 
@@ -251,30 +432,46 @@ class ArbitragePair:
 
         return self.arbitrage
 
-    def print(self):
+    def to_record(self):
+        # plain dict for the jsonl and socket outputs
+        return {
+            "pair_id": self.pair_id, "arbitrage": self.arbitrage, "edge": self.edge,
+            "kalshi": {"id": self.kalshi_id, "title": self.kalshi_title,
+                       "yes": self.kalshi_yes_price, "no": self.kalshi_no_price,
+                       "link": self.kalshi_link},
+            "poly": {"id": self.poly_id, "title": self.poly_title,
+                     "yes": self.poly_yes_price, "no": self.poly_no_price,
+                     "link": self.poly_link},
+        }
+
+    def render(self):
         if self.arbitrage == "none":
-            return
+            return ""
 
-        print("=" * 80)
+        lines = ["=" * 80]
 
-        print("\nKALSHI")
-        print(f"  Title: {self.kalshi_title}")
-        print(f"  YES:   {self.kalshi_yes_price:.4f}")
-        print(f"  NO:    {self.kalshi_no_price:.4f}")
-        print(f"  LINK:  {self.kalshi_link}")
+        lines.append("\nKALSHI")
+        lines.append(f"  Title: {self.kalshi_title}")
+        lines.append(f"  YES:   {self.kalshi_yes_price:.4f}")
+        lines.append(f"  NO:    {self.kalshi_no_price:.4f}")
+        lines.append(f"  LINK:  {self.kalshi_link}")
 
-        print("\nPOLYMARKET")
-        print(f"  Title: {self.poly_title}")
-        print(f"  YES:   {self.poly_yes_price:.4f}")
-        print(f"  NO:    {self.poly_no_price:.4f}")
-        print(f"  LINK:  {self.poly_link}")
+        lines.append("\nPOLYMARKET")
+        lines.append(f"  Title: {self.poly_title}")
+        lines.append(f"  YES:   {self.poly_yes_price:.4f}")
+        lines.append(f"  NO:    {self.poly_no_price:.4f}")
+        lines.append(f"  LINK:  {self.poly_link}")
 
         if (self.arbitrage == "kp"):
-            print("\nBuy yes on Kalshi, No on Polymarket\n")
+            lines.append("\nBuy yes on Kalshi, No on Polymarket\n")
         else:
-            print("\nBuy yes on Polymarket, No on Kalshi\n")
-        print(f"Edge = {self.edge:.4%}\n")
-        print("="*80)
+            lines.append("\nBuy yes on Polymarket, No on Kalshi\n")
+        lines.append(f"Edge = {self.edge:.4%}\n")
+        lines.append("=" * 80)
+        return "\n".join(lines) + "\n"
+
+    def print(self):
+        print(self.render(), end="")
 
 
 def write_to_file(filepath, data):
@@ -301,13 +498,12 @@ if __name__ == "__main__":
     for event in bitcoin_events:
         markets = poly_extractor.get_markets(event)
         for market in markets:
-            bitcoin_poly_markets.append(market['question'])
+            bitcoin_poly_markets.append(market.title)
 
     for series in bitcoin_series:
         markets = kalshi_extractor.get_markets(series['ticker'])
         for market in markets:
-            bitcoin_kalshi_markets.append(
-                f"{market['title']} {market['yes_sub_title']}")
+            bitcoin_kalshi_markets.append(market.title)
 
     print(f"len of poly markets {len(bitcoin_poly_markets)}")
     print(f"len of kalshi markets {len(bitcoin_kalshi_markets)}")
@@ -322,9 +518,9 @@ if __name__ == "__main__":
     # print matching arb pairs
     for matching_pair in matching_pairs:
         poly_title = matching_pair['poly_title']
-        poly_market = poly_extractor.title_to_markets.get(poly_title, {})
+        poly_market = next(iter(poly_extractor.markets.by_title(poly_title)), None)
         kalshi_title = matching_pair['kalshi_title']
-        kalshi_market = kalshi_extractor.title_to_markets.get(kalshi_title, {})
+        kalshi_market = next(iter(kalshi_extractor.markets.by_title(kalshi_title)), None)
 
         p_yes, p_no, p_link = poly_extractor.get_market_yn_link(poly_market)
         k_yes, k_no, k_link = kalshi_extractor.get_market_yn_link(
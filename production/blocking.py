@@ -0,0 +1,144 @@
+from collections import Counter
+import re
+
+# candidate blocking: canonical tokens are pulled from each title the first
+# time a token based matcher runs (underlying asset, amounts, dates, direction) and an inverted index over
+# them yields only the cross-exchange pairs sharing enough key tokens inside
+# the close window. everything downstream starts from these candidates
+
+ASSET_ALIASES = {
+    "bitcoin": "btc", "btc": "btc",
+    "ethereum": "eth", "ether": "eth", "eth": "eth",
+    "solana": "sol", "sol": "sol",
+    "xrp": "xrp", "ripple": "xrp",
+    "dogecoin": "doge", "doge": "doge",
+    "fed": "fed", "fomc": "fed",
+    "cpi": "cpi", "inflation": "cpi",
+    "gdp": "gdp", "unemployment": "unemployment", "payrolls": "payrolls",
+    "s&p": "spx", "spx": "spx", "nasdaq": "ndx",
+    "gold": "gold", "oil": "oil", "wti": "oil",
+}
+
+MONTHS = {"jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6, "jul": 7,
+          "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12}
+
+_WORD_RE = re.compile(r"[a-z&]+")
+_DATE_RE = re.compile(
+    r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+(\d{1,2})\b", re.IGNORECASE)
+_YEAR_RE = re.compile(r"\b(20[2-4]\d)\b")
+_UP_RE = re.compile(
+    r"\b(above|over|greater|more than|at least|reach|hit|rise|higher|exceed)", re.IGNORECASE)
+_DOWN_RE = re.compile(
+    r"\b(below|under|less than|at most|dip|drop|fall|lower)", re.IGNORECASE)
+_RANGE_RE = re.compile(r"\b(between|range)\b|\d\s*to\s*\$?\d", re.IGNORECASE)
+
+# shared token weight a pair needs to be a candidate. an amount is the most
+# specific token a title has, so a shared amount alone is enough
+MIN_SHARED_TOKENS = 2
+TOKEN_WEIGHTS = {"num": 2}
+# postings longer than this fraction of the index are too common to block on
+MAX_TOKEN_DF = 0.5
+
+
+def amount_bucket(value):
+    # two significant figures, so 96,249.99 and 96,250 land on the same token
+    if value < 100:
+        return value
+    digits = len(str(int(value))) - 2
+    return int(round(value, -digits))
+
+
+def extract_tokens(title, amounts, strikes=()):
+    # amounts is [(pos, value)] as returned by Formatter._all_amounts_with_pos,
+    # strikes are the parsed strike bounds, the most reliable amounts a market has
+    text = title.lower()
+    tokens = set()
+    for word in _WORD_RE.findall(text):
+        asset = ASSET_ALIASES.get(word)
+        if asset:
+            tokens.add(f"asset:{asset}")
+
+    date_spans = []
+    for m in _DATE_RE.finditer(text):
+        tokens.add(f"date:{MONTHS[m.group(1).lower()[:3]]}-{int(m.group(2))}")
+        date_spans.append((m.start(2), m.end(2)))
+    years = set()
+    for m in _YEAR_RE.finditer(text):
+        years.add(m.start())
+        tokens.add(f"year:{m.group(1)}")
+
+    for pos, value in amounts:
+        # day of month and year numbers are already date tokens
+        if pos in years or any(start <= pos < end for start, end in date_spans):
+            continue
+        if value >= 100:
+            tokens.add(f"num:{amount_bucket(value)}")
+    for value in strikes:
+        if value is not None and value >= 100:
+            tokens.add(f"num:{amount_bucket(value)}")
+
+    if _RANGE_RE.search(text):
+        tokens.add("dir:range")
+    elif _UP_RE.search(text):
+        tokens.add("dir:up")
+    elif _DOWN_RE.search(text):
+        tokens.add("dir:down")
+    return frozenset(tokens)
+
+
+class TokenIndex:
+    def __init__(self, max_df=MAX_TOKEN_DF):
+        self.max_df = max_df
+        self.postings = {}
+        self.tokens = {}
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def add(self, key, tokens):
+        self.remove(key)
+        self.tokens[key] = tokens
+        for token in tokens:
+            self.postings.setdefault(token, set()).add(key)
+
+    def remove(self, key):
+        for token in self.tokens.pop(key, ()):
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.discard(key)
+                if not posting:
+                    del self.postings[token]
+
+    def candidates(self, tokens, min_shared=MIN_SHARED_TOKENS):
+        # keys sharing at least min_shared token weight, skipping tokens too common to discriminate
+        limit = max(1, int(len(self.tokens) * self.max_df))
+        counts = Counter()
+        for token in tokens:
+            posting = self.postings.get(token)
+            if posting is None or len(posting) > limit:
+                continue
+            weight = TOKEN_WEIGHTS.get(token.split(":", 1)[0], 1)
+            for key in posting:
+                counts[key] += weight
+        return [key for key, n in counts.items() if n >= min_shared]
+
+
+def block_pairs(kalshi_markets, poly_markets, close_window, min_shared=MIN_SHARED_TOKENS):
+    # (kalshi, poly) candidates sharing key tokens and closing within the window
+    index = TokenIndex()
+    poly_by_key = {}
+    for i, market in enumerate(poly_markets):
+        if market.close_ts is None:
+            continue
+        poly_by_key[i] = market
+        index.add(i, market.tokens)
+
+    pairs = []
+    for k_market in kalshi_markets:
+        if k_market.close_ts is None:
+            continue
+        for key in index.candidates(k_market.tokens, min_shared):
+            p_market = poly_by_key[key]
+            if abs(k_market.close_ts - p_market.close_ts) <= close_window:
+                pairs.append((k_market, p_market))
+    return pairs
@@ -0,0 +1,224 @@
+import time
+
+_START = time.perf_counter()
+
+import argparse
+import os
+import sys
+
+# single entry point: python cli.py {scan,daemon,replay,bench}
+#
+# only the stdlib is imported at module load. every mode imports the extractor
+# and matcher stack inside its own handler, so --help and argument errors
+# return before requests, the extractors or the matchers are loaded.
+
+DEFAULT_CATEGORY = "Crypto"
+DEFAULT_INTERVAL = 60.0
+BENCH_MODES = ("nested", "blocking", "event_first", "contract_join", "sharded", "out_of_core")
+
+
+def report_startup(mode):
+    # time from cli import until the mode's own imports are done
+    print(f"[{mode}] startup {(time.perf_counter() - _START) * 1000:.1f}ms",
+          file=sys.stderr)
+
+
+def _floats(value):
+    return [float(v) for v in value.split(",")] if value else None
+
+
+def _build_output(args):
+    from output import Output, SummarySink, JsonlSink, SocketPublisher
+
+    sinks = [] if args.quiet else [SummarySink()]
+    if args.jsonl:
+        sinks.append(JsonlSink(args.jsonl))
+    if args.publish is not None:
+        publisher = SocketPublisher(args.publish)
+        print(f"publishing on {publisher.address[0]}:{publisher.address[1]}", file=sys.stderr)
+        sinks.append(publisher)
+    return Output(sinks)
+
+
+def _build_engine(args):
+    from engine import Engine
+
+    edge_table = None
+    if args.edge_table is not None:
+        from edge_table import EdgeTable, EDGE_TABLE_NAME
+
+        try:
+            edge_table = EdgeTable(args.edge_table or EDGE_TABLE_NAME)
+        except FileExistsError as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+    memory_budget = None
+    if args.memory_budget is not None:
+        memory_budget = int(args.memory_budget * 1024 * 1024)
+    engine = Engine(output=_build_output(args), workers=args.workers,
+                    memory_budget=memory_budget)
+    engine.edge_table = edge_table
+    if args.profile is not None:
+        run_dir = engine.enable_profiling(args.profile or None)
+        print(f"profiling stages into {run_dir}", file=sys.stderr)
+    # the sharded and out of core matchers only run on full rematches
+    engine.incremental = not (args.full or args.workers > 1 or memory_budget is not None)
+    engine.range_search = not args.no_ranges
+    categories = engine.get_categories_from_file(args.category, args.config)
+    return engine, categories
+
+
+def cmd_scan(args):
+    engine, categories = _build_engine(args)
+    report_startup("scan")
+    if args.warm:
+        engine.run_warm(*categories)
+    else:
+        engine.run_engine(*categories)
+    engine.close()
+
+
+def cmd_daemon(args):
+    engine, categories = _build_engine(args)
+    report_startup("daemon")
+    # only the first cycle warm starts, later ones run incrementally from its state
+    run = engine.run_warm if args.warm else engine.run_engine
+    try:
+        while True:
+            started = time.perf_counter()
+            run(*categories)
+            run = engine.run_engine
+            engine.output.log(f"registries: {engine.registry_stats()}")
+            if engine.edge_table is not None:
+                engine.output.log(f"edge table: {len(engine.edge_table)} pairs, "
+                                  f"{engine.edge_table.dropped} dropped while full")
+            time.sleep(max(0.0, args.interval - (time.perf_counter() - started)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.close()
+
+
+def cmd_replay(args):
+    from matching_engine import CLOSE_WINDOW, STRIKE_TOLERANCE
+    from replay import sweep, print_report
+    from snapshot import list_snapshots, SNAPSHOT_DIR
+
+    report_startup("replay")
+    directory = args.dir or SNAPSHOT_DIR
+    paths = list_snapshots(directory)
+    if not paths:
+        print(f"[ERROR] No snapshots found in {directory}")
+        return 1
+
+    hours = _floats(args.close_window_hours) or [CLOSE_WINDOW / 3600]
+    tolerances = _floats(args.tolerance) or [STRIKE_TOLERANCE]
+    start = time.perf_counter()
+    results = sweep(paths, [h * 3600 for h in hours], tolerances, args.workers)
+    print(f"replayed {len(paths)} snapshots x {len(results)} parameter sets "
+          f"in {time.perf_counter() - start:.2f}s")
+    print_report(results)
+
+
+def _bench_matcher(mode, workers):
+    from matching_engine import ComplexMatcher
+
+    options = {
+        "nested": {},
+        "blocking": {"blocking": True},
+        "event_first": {"event_first": True},
+        "contract_join": {"contract_join": True},
+        "sharded": {"workers": workers},
+        "out_of_core": {"memory_budget": 8 * 1024 * 1024},
+    }[mode]
+    matcher = ComplexMatcher(write_snapshots=False, **options)
+    matcher.enable_logs = False
+    return matcher
+
+
+def cmd_bench(args):
+    from snapshot import SnapshotReader, latest_snapshot
+
+    report_startup("bench")
+    path = args.snapshot or latest_snapshot()
+    if path is None:
+        print("[ERROR] No snapshot to benchmark, run a scan first or pass --snapshot")
+        return 1
+    with SnapshotReader(path) as reader:
+        kalshi_ttm, poly_ttm = reader.markets()
+    print(f"{os.path.basename(path)}: {len(kalshi_ttm)} kalshi, {len(poly_ttm)} poly markets")
+
+    for mode in args.modes.split(","):
+        timings = []
+        with _bench_matcher(mode, args.workers) as matcher:
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                pairs = matcher.get_matching_pairs(poly_ttm, kalshi_ttm)
+                timings.append(time.perf_counter() - start)
+        print(f"{mode:>14}  best {min(timings) * 1000:9.1f}ms  "
+              f"mean {sum(timings) / len(timings) * 1000:9.1f}ms  pairs {len(pairs)}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="polymarket / kalshi arbitrage engine")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, handler, help_text in (("scan", cmd_scan, "fetch, match and rank once"),
+                                     ("daemon", cmd_daemon, "scan on an interval")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--category", default=DEFAULT_CATEGORY)
+        p.add_argument("--config", default="poly_kalshi_grouped_tags.json",
+                       help="category file, bare names resolve against PK_CONFIG_DIR "
+                            "or the repo root")
+        p.add_argument("--full", action="store_true",
+                       help="rematch the full universe instead of per cycle deltas")
+        p.add_argument("--workers", type=int, default=1,
+                       help="format and match close time shards in this many processes, "
+                            "implies --full")
+        p.add_argument("--memory-budget", type=float, default=None, metavar="MB",
+                       help="match from sorted runs spilled to disk past this many "
+                            "megabytes, implies --full")
+        p.add_argument("--no-ranges", action="store_true",
+                       help="skip the range combination search")
+        p.add_argument("--jsonl", default=None, help="append every result event to this file")
+        p.add_argument("--publish", type=int, default=None, metavar="PORT",
+                       help="stream result events as json lines to local subscribers")
+        p.add_argument("--quiet", action="store_true", help="no summary on stdout")
+        p.add_argument("--edge-table", nargs="?", const="", default=None, metavar="NAME",
+                       help="keep the arbitrage table in a shared memory segment, "
+                            "read it with edge_table.EdgeTableReader")
+        p.add_argument("--profile", nargs="?", const="", default=None, metavar="DIR",
+                       help="write per stage cpu and memory reports to a run directory")
+        p.add_argument("--warm", action="store_true",
+                       help="report edges from the last snapshot while discovery runs")
+        if name == "daemon":
+            p.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                           help="seconds between scan starts")
+        p.set_defaults(handler=handler)
+
+    p = sub.add_parser("replay", help="replay stored snapshots through the matcher")
+    p.add_argument("--dir", default=None, help="snapshot directory")
+    p.add_argument("--close-window-hours", default=None,
+                   help="comma separated list to sweep")
+    p.add_argument("--tolerance", default=None, help="comma separated list to sweep")
+    p.add_argument("--workers", type=int, default=None)
+    p.set_defaults(handler=cmd_replay)
+
+    p = sub.add_parser("bench", help="time the matcher modes on a snapshot")
+    p.add_argument("--snapshot", default=None, help="defaults to the latest snapshot")
+    p.add_argument("--modes", default=",".join(BENCH_MODES),
+                   help="comma separated subset of " + ",".join(BENCH_MODES))
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--workers", type=int, default=max(2, os.cpu_count() or 1))
+    p.set_defaults(handler=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
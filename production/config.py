@@ -0,0 +1,15 @@
+import os
+
+# config files live in the repo root next to production/ unless PK_CONFIG_DIR
+# points somewhere else, so nothing depends on the working directory
+CONFIG_DIR = os.environ.get(
+    "PK_CONFIG_DIR", os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES_FILE = "poly_kalshi_grouped_tags.json"
+POLY_TAG_FILE = "poly_tags.json"
+KALSHI_CATEGORY_TO_TAGS_FILE = "kalshi_categories_to_tags.json"
+
+
+def config_path(name):
+    # absolute paths are used as given, bare names resolve against CONFIG_DIR
+    return name if os.path.isabs(name) else os.path.join(CONFIG_DIR, name)
@@ -0,0 +1,122 @@
+import math
+
+# canonical contract keys for structured markets (crypto, economics).
+#
+# a contract is (underlying, shape, strikes, resolution time). single
+# thresholds carry their direction ("above"/"below") so opposite contracts at
+# the same strike never join. the title's direction wins over the parsed bound
+# since poly "reach $X" parses into strike_ub.
+# strikes are bucketed on a log scale of width tolerance_pct and close times on
+# the close window, so equal contracts within tolerance land in the same or an
+# adjacent bucket and a hash join only has to probe the neighbours.
+
+# kalshi series ticker (without the KX prefix) -> underlying
+SERIES_UNDERLYINGS = {
+    "BTC": "btc", "BTCD": "btc", "BTCMAX": "btc", "BTCMIN": "btc", "BTCY": "btc",
+    "ETH": "eth", "ETHD": "eth", "ETHMAX": "eth", "ETHMIN": "eth", "ETHY": "eth",
+    "SOL": "sol", "SOLD": "sol", "XRP": "xrp", "XRPD": "xrp", "DOGE": "doge", "DOGED": "doge",
+    "FED": "fed", "FEDDECISION": "fed", "CPI": "cpi", "CPIYOY": "cpi", "GDP": "gdp",
+    "U3": "unemployment", "PAYROLLS": "payrolls",
+}
+
+
+def underlying(market):
+    if market.exchange == "kalshi" and market.event_id:
+        series = market.event_id.split("-")[0].upper()
+        if series.startswith("KX"):
+            series = series[2:]
+        if series in SERIES_UNDERLYINGS:
+            return SERIES_UNDERLYINGS[series]
+    # fall back to the title's asset token when it names exactly one
+    assets = [t[6:] for t in market.tokens if t.startswith("asset:")]
+    return assets[0] if len(assets) == 1 else None
+
+
+def direction(market):
+    # "above" or "below" for a single threshold market
+    if "dir:up" in market.tokens:
+        return "above"
+    if "dir:down" in market.tokens:
+        return "below"
+    return "above" if market.strike_lb is not None else "below"
+
+
+def contract_shape(market):
+    # ("above"|"below", strike) or ("range", lb, ub), None when the market has no strikes
+    lb, ub = market.strike_lb, market.strike_ub
+    if lb is not None and ub is not None:
+        return ("range", lb, ub)
+    if lb is not None or ub is not None:
+        return (direction(market), lb if lb is not None else ub)
+    return None
+
+
+class ContractKeyer:
+    def __init__(self, close_window, tolerance_pct):
+        self.close_window = close_window
+        self.tolerance_pct = tolerance_pct
+        # widest log ratio two strikes equal within tolerance can have
+        self._log_step = math.log(
+            (1 + tolerance_pct / 2) / (1 - tolerance_pct / 2))
+
+    def strike_bucket(self, value):
+        if value <= 0:
+            return ("nonpos", round(value, 6))
+        return math.floor(math.log(value) / self._log_step)
+
+    def time_bucket(self, close_ts):
+        return math.floor(close_ts / self.close_window)
+
+    def key(self, market):
+        # hashable canonical key, None when the market is not a structured contract
+        if market.close_ts is None:
+            return None
+        asset = underlying(market)
+        shape = contract_shape(market)
+        if asset is None or shape is None:
+            return None
+        strikes = tuple(self.strike_bucket(v) for v in shape[1:])
+        return (asset, shape[0], strikes, self.time_bucket(market.close_ts))
+
+    def neighbours(self, key):
+        # every key a tolerance-equal contract can have
+        asset, shape, strikes, t = key
+        variants = [()]
+        for s in strikes:
+            steps = (s - 1, s, s + 1) if isinstance(s, int) else (s,)
+            variants = [v + (n,) for v in variants for n in steps]
+        for dt in (-1, 0, 1):
+            for v in variants:
+                yield (asset, shape, v, t + dt)
+
+    def same_contract(self, a, b):
+        if abs(a.close_ts - b.close_ts) > self.close_window:
+            return False
+        sa, sb = contract_shape(a), contract_shape(b)
+        if sa[0] != sb[0]:
+            return False
+        for va, vb in zip(sa[1:], sb[1:]):
+            if not (va == vb or abs(va - vb) <= (abs(va) + abs(vb)) / 2 * self.tolerance_pct):
+                return False
+        return True
+
+
+def hash_join(kalshi_markets, poly_markets, close_window, tolerance_pct):
+    # (kalshi, poly) pairs describing the same contract in O(N + M) expected time
+    keyer = ContractKeyer(close_window, tolerance_pct)
+    table = {}
+    for p_market in poly_markets:
+        key = keyer.key(p_market)
+        if key is not None:
+            table.setdefault(key, []).append(p_market)
+
+    pairs = []
+    for k_market in kalshi_markets:
+        key = keyer.key(k_market)
+        if key is None:
+            continue
+        for probe in keyer.neighbours(key):
+            for p_market in table.get(probe, ()):
+                if keyer.same_contract(k_market, p_market):
+                    pairs.append((k_market, p_market))
+    return pairs
@@ -0,0 +1,45 @@
+import json
+
+# prefer orjson when it is installed, it decodes the large /events pages several times faster
+try:
+    import orjson
+
+    def loads(data):
+        return orjson.loads(data)
+except ImportError:
+    orjson = None
+
+    def loads(data):
+        return json.loads(data)
+
+
+# the only fields the engine reads, everything else is dropped before it is retained
+POLY_EVENT_FIELDS = ("id", "title", "slug", "endDate", "closed")
+POLY_MARKET_FIELDS = ("id", "conditionId", "question", "outcomePrices", "endDate",
+                      "slug", "groupItemTitle", "marketType", "category", "closed")
+KALSHI_MARKET_FIELDS = ("ticker", "event_ticker", "title", "yes_sub_title", "yes_ask",
+                        "no_ask", "close_time", "floor_strike", "cap_strike",
+                        "market_type", "status", "category")
+
+
+def decode_response(response):
+    # decodes the raw body instead of response.json() so the fast backend is used
+    return loads(response.content)
+
+
+def project(obj, fields):
+    return {field: obj[field] for field in fields if field in obj}
+
+
+def project_poly_events(events):
+    projected = []
+    for event in events:
+        slim = project(event, POLY_EVENT_FIELDS)
+        slim['markets'] = [project(market, POLY_MARKET_FIELDS)
+                           for market in event.get('markets', [])]
+        projected.append(slim)
+    return projected
+
+
+def project_kalshi_markets(markets):
+    return [project(market, KALSHI_MARKET_FIELDS) for market in markets]
@@ -0,0 +1,217 @@
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+import struct
+import sys
+import time
+
+# live arbitrage table in a named shared memory segment.
+#
+# fixed layout: a header followed by `capacity` fixed size rows. the engine
+# is the only writer; any local process can map the segment by name and read
+# it without IPC. consistency uses a sequence lock: the writer makes the
+# sequence odd, writes, then makes it even again. a reader copies the header
+# and rows, and retries if the sequence was odd or changed meanwhile.
+# this relies on the writer's stores becoming visible in program order, as
+# they do on x86.
+
+EDGE_TABLE_NAME = "pk_edge_table"
+EDGE_TABLE_CAPACITY = 4096
+EDGE_TABLE_MAGIC = b"PKEDGE\x00\x01"
+EDGE_TABLE_VERSION = 1
+# a reader gives up when the writer never leaves a consistent window for this long
+READ_TIMEOUT = 1.0
+
+# magic, version, capacity, count, sequence, updated ts
+_HEADER = struct.Struct("<8sIIIxxxxQd")
+# pair id, kalshi id, poly id, kalshi yes/no, poly yes/no, edge, direction,
+# first seen, updated
+_ROW = struct.Struct("<96s48s48sddddd4sxxxxdd")
+_COUNT_OFFSET = 16
+_SEQ_OFFSET = 24
+_UPDATED_OFFSET = 32
+
+EdgeRow = namedtuple("EdgeRow", [
+    "pair_id", "kalshi_id", "poly_id", "kalshi_yes", "kalshi_no", "poly_yes", "poly_no",
+    "edge", "direction", "first_seen", "updated"])
+
+
+def _encode(text, size):
+    return text.encode("utf-8")[:size]
+
+
+def _decode(raw):
+    return raw.rstrip(b"\x00").decode("utf-8", "replace")
+
+
+def table_size(capacity):
+    return _HEADER.size + capacity * _ROW.size
+
+
+class EdgeTable:
+    # writer side, owned by the engine
+    def __init__(self, name=EDGE_TABLE_NAME, capacity=EDGE_TABLE_CAPACITY):
+        self.name = name
+        self.capacity = capacity
+        size = table_size(capacity)
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # it may belong to another running engine, so it is never unlinked from here
+            raise FileExistsError(
+                f"edge table {name} already exists, pick another name or remove "
+                f"/dev/shm/{name} if no engine is using it") from None
+        self._buf = self._shm.buf
+        self._seq = 0
+        self._slots = {}
+        self._pair_ids = []
+        self._edges = {}
+        self._first_seen = {}
+        # arbitrage pairs left out because the table was full
+        self.dropped = 0
+        _HEADER.pack_into(self._buf, 0, EDGE_TABLE_MAGIC, EDGE_TABLE_VERSION,
+                          capacity, 0, 0, time.time())
+
+    def __len__(self):
+        return len(self._pair_ids)
+
+    def _begin(self):
+        self._seq += 1
+        struct.pack_into("<Q", self._buf, _SEQ_OFFSET, self._seq)
+
+    def _end(self):
+        # count and timestamp first, the even sequence number last
+        struct.pack_into("<I", self._buf, _COUNT_OFFSET, len(self._pair_ids))
+        struct.pack_into("<d", self._buf, _UPDATED_OFFSET, time.time())
+        self._seq += 1
+        struct.pack_into("<Q", self._buf, _SEQ_OFFSET, self._seq)
+
+    def _write_row(self, slot, pair, now):
+        first_seen = self._first_seen.setdefault(pair.pair_id, now)
+        _ROW.pack_into(self._buf, _HEADER.size + slot * _ROW.size,
+                       _encode(pair.pair_id, 96), _encode(pair.kalshi_id, 48),
+                       _encode(pair.poly_id, 48), pair.kalshi_yes_price,
+                       pair.kalshi_no_price, pair.poly_yes_price, pair.poly_no_price,
+                       pair.edge, _encode(pair.arbitrage, 4), first_seen, now)
+
+    def publish(self, pairs):
+        # replaces the whole table with the arbitrage pairs, best edge first
+        pairs = sorted((p for p in pairs if p.arbitrage != "none"),
+                       key=lambda p: p.edge, reverse=True)
+        self.dropped += max(0, len(pairs) - self.capacity)
+        pairs = pairs[:self.capacity]
+        now = time.time()
+        self._begin()
+        self._slots = {}
+        self._pair_ids = []
+        self._edges = {}
+        for slot, pair in enumerate(pairs):
+            self._slots[pair.pair_id] = slot
+            self._pair_ids.append(pair.pair_id)
+            self._edges[pair.pair_id] = pair.edge
+            self._write_row(slot, pair, now)
+        live = set(self._pair_ids)
+        self._first_seen = {k: v for k, v in self._first_seen.items() if k in live}
+        self._end()
+
+    def update(self, pair):
+        # one pair's quote or edge moved; rows without arbitrage are removed
+        if pair.arbitrage == "none":
+            return self.remove(pair.pair_id)
+        slot = self._slots.get(pair.pair_id)
+        if slot is None and len(self._pair_ids) >= self.capacity:
+            # full: the new pair takes the lowest edge row, or is dropped if it is lower
+            self.dropped += 1
+            lowest = min(self._pair_ids, key=self._edges.__getitem__)
+            if self._edges[lowest] >= pair.edge:
+                return
+            slot = self._slots.pop(lowest)
+            del self._edges[lowest]
+            self._first_seen.pop(lowest, None)
+            self._slots[pair.pair_id] = slot
+            self._pair_ids[slot] = pair.pair_id
+        elif slot is None:
+            slot = len(self._pair_ids)
+            self._slots[pair.pair_id] = slot
+            self._pair_ids.append(pair.pair_id)
+        self._edges[pair.pair_id] = pair.edge
+        self._begin()
+        self._write_row(slot, pair, time.time())
+        self._end()
+
+    def remove(self, pair_id):
+        slot = self._slots.pop(pair_id, None)
+        if slot is None:
+            return
+        self._edges.pop(pair_id, None)
+        self._first_seen.pop(pair_id, None)
+        self._begin()
+        # the last row moves into the freed slot
+        last = len(self._pair_ids) - 1
+        if slot != last:
+            offset = _HEADER.size
+            self._buf[offset + slot * _ROW.size:offset + (slot + 1) * _ROW.size] = \
+                self._buf[offset + last * _ROW.size:offset + (last + 1) * _ROW.size]
+            moved = self._pair_ids[last]
+            self._pair_ids[slot] = moved
+            self._slots[moved] = slot
+        self._pair_ids.pop()
+        self._end()
+
+    def close(self):
+        self._buf = None
+        self._shm.close()
+        self._shm.unlink()
+
+
+class EdgeTableReader:
+    # reader side, for execution and monitoring processes
+    def __init__(self, name=EDGE_TABLE_NAME):
+        self._shm = shared_memory.SharedMemory(name=name)
+        # the engine owns the segment, keep this process from unlinking it at exit
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+        magic, version, self.capacity, _, _, _ = _HEADER.unpack_from(self._shm.buf, 0)
+        if magic != EDGE_TABLE_MAGIC or version != EDGE_TABLE_VERSION:
+            self._shm.close()
+            raise ValueError(f"{name} is not an edge table")
+
+    def read(self):
+        # consistent (sequence, updated ts, rows) snapshot
+        buf = self._shm.buf
+        deadline = time.monotonic() + READ_TIMEOUT
+        while time.monotonic() < deadline:
+            seq = struct.unpack_from("<Q", buf, _SEQ_OFFSET)[0]
+            if seq & 1:
+                # a write is in progress, let the writer finish
+                time.sleep(0)
+                continue
+            _, _, _, count, _, updated = _HEADER.unpack_from(buf, 0)
+            count = min(count, self.capacity)
+            data = bytes(buf[_HEADER.size:_HEADER.size + count * _ROW.size])
+            if struct.unpack_from("<Q", buf, _SEQ_OFFSET)[0] != seq:
+                time.sleep(0)
+                continue
+            rows = []
+            for values in _ROW.iter_unpack(data):
+                values = list(values)
+                for i in (0, 1, 2, 8):
+                    values[i] = _decode(values[i])
+                rows.append(EdgeRow(*values))
+            return seq, updated, rows
+        raise TimeoutError("edge table kept changing during read")
+
+    def close(self):
+        self._shm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    with EdgeTableReader(sys.argv[1] if len(sys.argv) > 1 else EDGE_TABLE_NAME) as reader:
+        seq, updated, rows = reader.read()
+    print(f"seq {seq}, {len(rows)} pairs, updated {time.time() - updated:.1f}s ago")
+    for row in sorted(rows, key=lambda r: r.edge, reverse=True):
+        print(f"{row.edge:8.4%}  {row.direction:>4}  {row.pair_id}")
@@ -1,18 +1,63 @@
 from api_interface import KalshiExtractor, PolyExtractor, ArbitragePair
 from matching_engine import ComplexMatcher
+from history import HistoryStore
+from ranking import EdgeRanking
+from ingest import MarketDelta
+from pair_registry import market_key
+from registry import MarketRegistry, is_expired
+from output import Output
+from snapshot import SnapshotReader, latest_snapshot
+from config import (config_path, CATEGORIES_FILE, POLY_TAG_FILE,
+                    KALSHI_CATEGORY_TO_TAGS_FILE)
 import json
+import os
+import threading
+import time
+
+# seconds between quote refresh passes while warm started discovery runs
+WARM_REFRESH_INTERVAL = 5.0
 
 
 class Engine:
-    def __init__(self):
-        self.POLY_TAG_FILE = "poly_tags.json"
-        self.KALSHI_CATEGORY_TO_TAGS_FILE = "kalshi_categories_to_tags.json"
-        self.poly_extractor = PolyExtractor()
-        self.kalshi_extractor = KalshiExtractor()
-        self.complex_matcher = ComplexMatcher()
+    def __init__(self, output=None, workers=1, memory_budget=None):
+        self.POLY_TAG_FILE = config_path(POLY_TAG_FILE)
+        self.KALSHI_CATEGORY_TO_TAGS_FILE = config_path(KALSHI_CATEGORY_TO_TAGS_FILE)
+        # one id keyed registry for both venues, filled by the extractors
+        self.markets = MarketRegistry()
+        # held around ingestor and registry mutation, warm start refreshes quotes
+        # on this thread while discovery ingests on another
+        self.lock = threading.RLock()
+        self.poly_extractor = PolyExtractor(registry=self.markets, lock=self.lock)
+        self.kalshi_extractor = KalshiExtractor(registry=self.markets, lock=self.lock)
+        # the engine's universe is persisted for warm starts and replay. workers > 1
+        # shards full rematches across processes and a memory budget spills them to
+        # disk, deltas are always matched in process
+        self.complex_matcher = ComplexMatcher(write_snapshots=True, workers=workers,
+                                              memory_budget=memory_budget)
+        # results and stage logs are formatted and written off the scan thread
+        self.output = output if output is not None else Output()
+        self.complex_matcher.output = self.output
+        # optional shared memory EdgeTable kept current for local readers
+        self.edge_table = None
+        self.profiler = None
+        self.history = HistoryStore()
+        self.ranking = EdgeRanking()
+        # quote driven edge moves flow straight into the leaderboard
+        self.complex_matcher.pair_registry.subscribe(self.on_pair_update)
+        # match from per cycle market deltas instead of the full universe
+        self.incremental = True
+        # also search for ladders of buckets tiling a market on the other exchange
+        self.range_search = True
+        self.range_combinations = []
+        # markets seeded from the last snapshot, dropped at reconcile unless rediscovered
+        self.warm_markets = {}
+        self.matching_pairs = []
 
     def get_markets(self, poly_category, kalshi_category,
                     kalshi_tags):
+        with self.lock:
+            self.poly_extractor.ingestor.begin_cycle()
+            self.kalshi_extractor.ingestor.begin_cycle()
         poly_events = self.poly_extractor.get_events(poly_category)
     # returns all poly and kalshi markets related to the input params
         kalshi_series = []
@@ -31,42 +76,215 @@ class Engine:
         for event in poly_events:
             markets = self.poly_extractor.get_markets(event)
             for market in markets:
-                self.poly_markets.append(market['question'])
+                self.poly_markets.append(market.title)
 
-        for series in kalshi_series:
-            markets = self.kalshi_extractor.get_markets(series['ticker'])
+        series_to_markets = self.kalshi_extractor.get_markets_for_series(
+            [series['ticker'] for series in kalshi_series])
+        for markets in series_to_markets.values():
             for market in markets:
-                self.kalshi_markets.append(
-                    f"{market['title']} {market['yes_sub_title']}")
+                self.kalshi_markets.append(market.title)
+
+        self.output.log(f"found {len(self.poly_markets)} poly markets")
+        self.output.log(f"found {len(self.kalshi_markets)} kalshi markets")
 
-        print(f"found {len(self.poly_markets)} poly markets")
-        print(f"found {len(self.kalshi_markets)} kalshi markets")
+        with self.lock:
+            self.poly_delta = self.poly_extractor.ingestor.end_cycle()
+            self.kalshi_delta = self.kalshi_extractor.ingestor.end_cycle()
+            # markets gone from the listing leave the shared registry too
+            for delta in (self.poly_delta, self.kalshi_delta):
+                for market in delta.removed:
+                    self.markets.remove(market_key(market))
+            self.evict_expired()
 
         return self.poly_markets, self.kalshi_markets
 
-    def get_matching_markets(self):
-        poly_ttm = self.poly_extractor.title_to_markets
-        kalshi_ttm = self.kalshi_extractor.title_to_markets
+    def evict_expired(self, now=None):
+        # expired markets leave the registries and, through the delta, the matcher
+        evicted = 0
+        for extractor, delta in ((self.poly_extractor, self.poly_delta),
+                                 (self.kalshi_extractor, self.kalshi_delta)):
+            markets = extractor.evict_expired(now)
+            delta.removed.extend(markets)
+            evicted += len(markets)
+        if evicted:
+            self.output.log(f"evicted {evicted} expired markets")
+        return evicted
+
+    def registry_stats(self):
+        # the market registry is shared, the kalshi stats add its metadata
+        return self.kalshi_extractor.registry_stats()
 
-        self.matching_pairs = self.complex_matcher.get_matching_pairs(
-            poly_ttm, kalshi_ttm)
+    def get_matching_markets(self):
+        # every observed quote change and edge is kept for later study. incremental
+        # edges are recorded as the pair registry publishes them, see on_pair_update
+        if self.incremental:
+            self.matching_pairs = self.complex_matcher.apply_delta(
+                self.kalshi_delta, self.poly_delta)
+            for delta in (self.kalshi_delta, self.poly_delta):
+                self.history.record_markets(delta.added + delta.changed)
+        else:
+            poly_ttm = self.markets.for_exchange("poly")
+            kalshi_ttm = self.markets.for_exchange("kalshi")
+            self.matching_pairs = self.complex_matcher.get_matching_pairs(
+                poly_ttm, kalshi_ttm)
+            self.history.record_markets(kalshi_ttm.values())
+            self.history.record_markets(poly_ttm.values())
+            self.history.record_pairs(self.matching_pairs)
         return self.matching_pairs
 
-        # this function needs to fill self.arbitrage_pair_list
+    def on_pair_update(self, pair, removed=False):
+        # the registry only calls this when an edge moved by epsilon or a pair went away
+        self.output.publish("edge", (pair, removed))
+        self.history.record_edge(pair, removed=removed)
+        if removed:
+            self.ranking.remove(pair.pair_id)
+        else:
+            self.ranking.update(pair)
+        if self.edge_table is not None:
+            if removed:
+                self.edge_table.remove(pair.pair_id)
+            else:
+                self.edge_table.update(pair)
+
+    def on_quote(self, market):
+        # single market quote update, re-scores only the pairs containing it
+        return self.complex_matcher.update_quote(market)
+
     def get_arb_pair_list(self):
-        # get all arb pairs and sort by the edge
-        self.arbitrage_pair_list = [
-            pair for pair in self.pair_list if pair.arbitrage != "none"]
-        self.arbitrage_pair_list.sort(key=lambda x: x.edge)
+        # leaderboard of arb pairs, best edge first. the ranking is updated
+        # incrementally so only pairs whose edge moved are re-positioned
+        self.ranking.sync(self.matching_pairs)
+        self.arbitrage_pair_list = self.ranking.top()
+        if self.edge_table is not None:
+            self.edge_table.publish(self.matching_pairs)
+        return self.arbitrage_pair_list
+
+    def get_range_combinations(self):
+        combinations = self.complex_matcher.get_range_combinations(
+            self.markets.for_exchange("kalshi").values(),
+            self.markets.for_exchange("poly").values())
+        self.range_combinations = sorted(
+            (c for c in combinations if c.arbitrage != "none"),
+            key=lambda c: c.edge, reverse=True)
+        return self.range_combinations
 
     def print_arb_pairs(self):
-        print('Arb Pairs:')
-        for arb_pair in self.arbitrage_pair_list:
-            if arb_pair is not None:
-                arb_pair.print()
+        # rendered and written by the output thread
+        self.output.publish("pairs", [p for p in self.arbitrage_pair_list if p is not None])
+        self.output.publish("ranges", self.range_combinations)
+
+    # warm start: seed markets and pairs from the last snapshot, refresh quotes
+    # for the paired markets while full discovery runs in the background, then
+    # reconcile additions and removals once discovery finishes
+
+    def warm_start(self, path=None):
+        path = path or latest_snapshot()
+        if path is None:
+            return False
+        try:
+            with SnapshotReader(path) as reader:
+                kalshi_ttm, poly_ttm = reader.markets()
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Failed to load warm start snapshot {path}: {e}")
+            return False
+
+        # markets that closed since the snapshot was written are not seeded
+        now = time.time()
+        kalshi_ttm, poly_ttm = (
+            {key: m for key, m in ttm.items() if not is_expired(m, now)}
+            for ttm in (kalshi_ttm, poly_ttm))
+        with self.lock:
+            self.warm_markets = {self.markets.add(m): m
+                                 for ttm in (kalshi_ttm, poly_ttm) for m in ttm.values()}
+        self.matching_pairs = self.complex_matcher.apply_delta(
+            MarketDelta(added=list(kalshi_ttm.values())),
+            MarketDelta(added=list(poly_ttm.values())))
+        self.output.log(f"warm start from {os.path.basename(path)}: "
+                        f"{len(self.warm_markets)} markets, {len(self.matching_pairs)} pairs")
+        return True
+
+    def refresh_quotes(self):
+        # one quote refresh per market that is part of a matched pair
+        refreshed = 0
+        for key in list(self.complex_matcher.pair_registry.market_pairs):
+            market = self.complex_matcher.markets.get(key)
+            if market is None or not market.market_id:
+                continue
+            if market.exchange == "kalshi":
+                market = self.kalshi_extractor.refresh_market(market.market_id)
+            else:
+                market = self.poly_extractor.refresh_market(
+                    market.market_id, market.event_id)
+            if market is not None:
+                self.on_quote(market)
+                self.history.record_quote(market)
+                refreshed += 1
+        return refreshed
 
-    def get_categories_from_file(self, category_name):
-        with open("../poly_kalshi_grouped_tags.json") as f:
+    def drop_unlisted_warm(self):
+        # warm markets a complete discovery did not list again are removed with the
+        # delta. a side whose fetch was partial keeps them until a complete cycle
+        removed = 0
+        for extractor, delta in ((self.kalshi_extractor, self.kalshi_delta),
+                                 (self.poly_extractor, self.poly_delta)):
+            if not extractor.ingestor.complete:
+                continue
+            exchange = "kalshi" if extractor is self.kalshi_extractor else "poly"
+            found = {market_key(record)
+                     for _, record in extractor.ingestor.fingerprints.values()}
+            for key, market in list(self.warm_markets.items()):
+                if market.exchange != exchange:
+                    continue
+                # listed ones are tracked by the ingestor from here on
+                del self.warm_markets[key]
+                if key in found:
+                    continue
+                delta.removed.append(market)
+                if self.markets.get(key) is market:
+                    self.markets.remove(key)
+                removed += 1
+        return removed
+
+    def reconcile(self):
+        removed = self.drop_unlisted_warm()
+        self.output.log(f"reconciled warm start: {removed} markets removed, "
+                        f"{len(self.warm_markets)} kept after a partial fetch")
+        return self.get_matching_markets()
+
+    def _discover(self, poly_category, kalshi_category, kalshi_tags):
+        self.get_markets(poly_category, kalshi_category, kalshi_tags)
+        self.discovery_done = True
+
+    def run_warm(self, poly_category, kalshi_category, kalshi_tags,
+                 refresh_interval=WARM_REFRESH_INTERVAL, snapshot_path=None):
+        if not self.warm_start(snapshot_path):
+            self.output.log("no snapshot to warm start from, running full discovery")
+            return self.run_engine(poly_category, kalshi_category, kalshi_tags)
+        self.get_arb_pair_list()
+        self.print_arb_pairs()
+
+        self.discovery_done = False
+        discovery = threading.Thread(
+            target=self._discover, args=(poly_category, kalshi_category, kalshi_tags),
+            name="discovery", daemon=True)
+        discovery.start()
+        while discovery.is_alive():
+            discovery.join(refresh_interval)
+            if discovery.is_alive() and self.refresh_quotes():
+                self.get_arb_pair_list()
+                self.print_arb_pairs()
+
+        if not self.discovery_done:
+            print("[ERROR] Background discovery failed, keeping the warm started markets")
+            return
+        self.reconcile()
+        self.get_arb_pair_list()
+        if self.range_search:
+            self.get_range_combinations()
+        self.print_arb_pairs()
+
+    def get_categories_from_file(self, category_name, path=CATEGORIES_FILE):
+        with open(config_path(path)) as f:
             categories = json.load(f)
 
         poly_category = categories[category_name]['poly_tag']
@@ -77,10 +295,40 @@ class Engine:
 
     def run_engine(self, poly_category, kalshi_category, kalshi_tags):
         self.get_markets(poly_category, kalshi_category, kalshi_tags)
-        self.arbitrage_pair_list = self.get_matching_markets()
-        print(self.arbitrage_pair_list)
+        if self.warm_markets:
+            self.drop_unlisted_warm()
+        self.get_matching_markets()
+        self.get_arb_pair_list()
+        if self.range_search:
+            self.get_range_combinations()
         self.print_arb_pairs()
 
+    def enable_profiling(self, run_dir=None):
+        # opt-in: each stage gets a cpu sample and tracemalloc report, see profiling.py
+        from profiling import StageProfiler, ENGINE_STAGES
+
+        self.profiler = StageProfiler(run_dir)
+        self.profiler.wrap(self, ENGINE_STAGES)
+        return self.profiler.run_dir
+
+    def flush(self):
+        # waits for every background writer, cycles don't call it so they never wait
+        # on disk. close() drains at teardown
+        self.output.flush()
+        if self.complex_matcher.snapshot_writer is not None:
+            self.complex_matcher.snapshot_writer.flush()
+        self.history.flush()
+
+    def close(self):
+        # drains and stops every background writer and worker, once at process teardown
+        self.complex_matcher.close()
+        self.history.close()
+        self.output.close()
+        if self.edge_table is not None:
+            self.edge_table.close()
+        if self.profiler is not None:
+            self.profiler.close()
+
 
 if __name__ == "__main__":
     category_name = "Crypto"
@@ -89,3 +337,4 @@ if __name__ == "__main__":
     poly_category, kalshi_category, kalshi_tags = arb_engine.get_categories_from_file(
         category_name)
     arb_engine.run_engine(poly_category, kalshi_category, kalshi_tags)
+    arb_engine.close()
@@ -0,0 +1,96 @@
+import re
+
+from blocking import ASSET_ALIASES, TokenIndex
+
+# two-level matching: poly events are paired with kalshi events on cheap
+# event features first (close time overlap, shared title tokens), and
+# markets are only compared inside paired events. for ladder events this
+# replaces ladder_width^2 comparisons per unrelated event pair with none.
+
+# jaccard similarity of event tokens needed to pair two events
+EVENT_MIN_SIMILARITY = 0.3
+EVENT_TOKEN_KINDS = ("asset:", "dir:")
+# title words that say nothing about what an event is about. asset names are
+# already asset: tokens and dates are covered by close_ts
+EVENT_STOPWORDS = frozenset([
+    "the", "will", "be", "of", "on", "in", "at", "by", "for", "to", "or", "and",
+    "what", "how", "which", "who", "this", "that", "than", "end", "price",
+    "january", "february", "march", "april", "may", "june", "july", "august",
+    "september", "october", "november", "december",
+    "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+])
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def title_words(title):
+    # normalized title words as word: tokens
+    return {f"word:{w}" for w in _WORD_RE.findall(title.lower())
+            if len(w) > 2 and w not in EVENT_STOPWORDS and w not in ASSET_ALIASES}
+
+
+class EventGroup:
+    def __init__(self, event_id, markets):
+        self.event_id = event_id
+        self.markets = markets
+        closes = [m.close_ts for m in markets]
+        self.close_lo = min(closes)
+        self.close_hi = max(closes)
+        # amounts tell ladder rungs apart and close_ts already covers dates,
+        # so events are described by what they are about
+        self.tokens = frozenset(t for m in markets for t in m.tokens
+                                if t.startswith(EVENT_TOKEN_KINDS))
+        # the event title: words every market title of the event shares. lets
+        # events the token extractor knows nothing about still pair
+        self.words = frozenset(set.intersection(*(title_words(m.title) for m in markets)))
+
+
+def group_by_event(markets):
+    # markets without an event id fall back to one group per close time
+    groups = {}
+    for market in markets:
+        if market.close_ts is None:
+            continue
+        groups.setdefault(market.event_id or market.close_time, []).append(market)
+    return [EventGroup(event_id, group) for event_id, group in groups.items()]
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def event_similarity(a, b):
+    # scored separately so title words don't dilute asset and direction matches
+    return max(jaccard(a.tokens, b.tokens), jaccard(a.words, b.words))
+
+
+def pair_events(kalshi_groups, poly_groups, close_window, min_similarity=EVENT_MIN_SIMILARITY):
+    index = TokenIndex(max_df=1.0)
+    for i, group in enumerate(poly_groups):
+        index.add(i, group.tokens | group.words)
+
+    event_pairs = []
+    for k_group in kalshi_groups:
+        for i in index.candidates(k_group.tokens | k_group.words, min_shared=1):
+            p_group = poly_groups[i]
+            # close time ranges must come within the window of each other
+            if k_group.close_lo - close_window > p_group.close_hi:
+                continue
+            if p_group.close_lo - close_window > k_group.close_hi:
+                continue
+            if event_similarity(k_group, p_group) >= min_similarity:
+                event_pairs.append((k_group, p_group))
+    return event_pairs
+
+
+def match_within_events(event_pairs, close_window):
+    # market candidates only from inside paired events
+    pairs = []
+    for k_group, p_group in event_pairs:
+        for k_market in k_group.markets:
+            for p_market in p_group.markets:
+                if abs(k_market.close_ts - p_market.close_ts) <= close_window:
+                    pairs.append((k_market, p_market))
+    return pairs
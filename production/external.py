@@ -0,0 +1,142 @@
+import heapq
+import json
+import os
+import shutil
+import tempfile
+from collections import deque
+from dataclasses import fields
+
+from decode import loads
+from format import Market
+
+# out-of-core close-time join.
+#
+# markets are spilled as sorted runs of "<close_ts>\t<json row>" lines once
+# the in-memory buffer passes the budget, the runs are k-way merged into one
+# close-ordered stream per exchange and the two streams are joined with a
+# sliding window. only the buffer, one line per open run and the poly markets
+# inside the current close window are ever held in memory.
+
+# bytes of buffered rows before a run is spilled
+MEMORY_BUDGET = 64 * 1024 * 1024
+# rough per-row overhead of the buffered tuple and string objects
+ROW_OVERHEAD = 120
+# runs merged at once, more runs are first merged into longer ones
+MAX_MERGE_FANIN = 64
+
+SPILL_FIELDS = [f.name for f in fields(Market) if f.name != "tokens"]
+
+
+def _encode_row(market):
+    return f"{market.close_ts!r}\t{json.dumps([getattr(market, name) for name in SPILL_FIELDS])}\n"
+
+
+def _decode_row(line):
+    return Market(**dict(zip(SPILL_FIELDS, loads(line.split("\t", 1)[1]))))
+
+
+def _row_key(line):
+    return float(line.split("\t", 1)[0])
+
+
+class SpillSorter:
+    # external sort of markets by close_ts within a memory budget
+    def __init__(self, directory, memory_budget=MEMORY_BUDGET):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.runs = []
+        self.rows = 0
+        self._run_count = 0
+        self._buffer = []
+        self._buffered = 0
+
+    def add(self, market):
+        # markets without a close time never match and are not spilled
+        if market.close_ts is None:
+            return
+        line = _encode_row(market)
+        self._buffer.append((market.close_ts, line))
+        self._buffered += len(line) + ROW_OVERHEAD
+        self.rows += 1
+        if self._buffered >= self.memory_budget:
+            self._spill()
+
+    def _spill(self):
+        if not self._buffer:
+            return
+        self._buffer.sort(key=lambda row: row[0])
+        self.runs.append(self._write_run(line for _, line in self._buffer))
+        self._buffer = []
+        self._buffered = 0
+
+    def _write_run(self, lines):
+        path = os.path.join(self.directory, f"run-{id(self):x}-{self._run_count}.jsonl")
+        self._run_count += 1
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        return path
+
+    def _merge_runs(self, paths):
+        files = [open(path, encoding="utf-8") for path in paths]
+        try:
+            yield from heapq.merge(*files, key=_row_key)
+        finally:
+            for f in files:
+                f.close()
+
+    def stream(self):
+        # close-ordered Market stream over every spilled run
+        self._spill()
+        while len(self.runs) > MAX_MERGE_FANIN:
+            batch, self.runs = self.runs[:MAX_MERGE_FANIN], self.runs[MAX_MERGE_FANIN:]
+            self.runs.append(self._write_run(self._merge_runs(batch)))
+            for path in batch:
+                os.remove(path)
+        for line in self._merge_runs(self.runs):
+            yield _decode_row(line)
+
+
+def merge_join(kalshi_stream, poly_stream, close_window):
+    # both streams ascending by close_ts; yields every (kalshi, poly) pair within the window
+    window = deque()
+    poly_iter = iter(poly_stream)
+    pending = next(poly_iter, None)
+    for k_market in kalshi_stream:
+        k_close = k_market.close_ts
+        while pending is not None and pending.close_ts <= k_close + close_window:
+            window.append(pending)
+            pending = next(poly_iter, None)
+        while window and window[0].close_ts < k_close - close_window:
+            window.popleft()
+        for p_market in window:
+            yield k_market, p_market
+
+
+class OutOfCoreMatcher:
+    # spill both exchanges, then stream the close-time join from disk
+    def __init__(self, close_window, memory_budget=MEMORY_BUDGET, directory=None):
+        self.close_window = close_window
+        self.directory = tempfile.mkdtemp(prefix="pk-spill-", dir=directory)
+        # the budget is shared by the two exchange buffers
+        self.sorters = {"kalshi": SpillSorter(self.directory, memory_budget // 2),
+                        "poly": SpillSorter(self.directory, memory_budget // 2)}
+
+    def add(self, market):
+        self.sorters[market.exchange].add(market)
+
+    def add_all(self, markets):
+        for market in markets:
+            self.add(market)
+
+    def pairs(self):
+        return merge_join(self.sorters["kalshi"].stream(),
+                          self.sorters["poly"].stream(), self.close_window)
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
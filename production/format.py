@@ -1,9 +1,14 @@
 from dataclasses import dataclass
-import json
+from datetime import datetime
 import re
+from decode import loads
+from blocking import extract_tokens
+from pair_registry import market_key
 
 
-@dataclass
+# normalized market record, built once per raw payload at ingest.
+# prices are in dollars on both exchanges
+@dataclass(slots=True)
 class Market:
     title: str
     category: str
@@ -15,6 +20,13 @@ class Market:
     strike_lb: float
     strike_ub: float
     link: str
+    market_id: str = ''
+    event_id: str = ''
+    close_ts: float = None
+    status: str = ''
+    # canonical title tokens for candidate blocking, see blocking.py. filled in
+    # lazily by the matchers that need them, empty until then
+    tokens: frozenset = frozenset()
 
 
 class Formatter:
@@ -130,86 +142,113 @@ class Formatter:
             mult = {"k": 1_000, "m": 1_000_000, "b": 1_000_000_000}[suffix]
         return int(float(s) * mult)
 
-    def format_ttms(self, poly_ttm, kalshi_ttm):
-        # takes in title to market dictionary and returns a list of Market objects:
-        #     title, yes_price, no_price, close_time
-        kalshi_market_ttm = {}
-
-        exchange = "kalshi"
-        for market in kalshi_ttm.values():
-            title = f"{market['title']} {market['yes_sub_title']}"
-            category = market.get('category', '')
-            yes_price = float(market['yes_ask'])
-            no_price = float(market['no_ask'])
-            close_time = market['close_time']
-
-            series_ticker = market['event_ticker'].split('-')[0]
-
-            link = f"https://kalshi.com/markets/{series_ticker.lower()}"
-            try:
-                strike_lb = float(market['floor_strike'])
-            except:
-                strike_lb = None
+    def parse_close_ts(self, close_time):
+        # iso close time -> epoch seconds, None when missing or malformed
+        if not close_time:
+            return None
+        try:
+            return datetime.fromisoformat(close_time).timestamp()
+        except (TypeError, ValueError):
+            return None
 
+    def poly_strikes(self, title, group_item_title):
+        # returns (strike_lb, strike_ub) from the bucket label, falling back to the title
+        if len(group_item_title) > 0:
+            group_item_title = group_item_title.replace(
+                ",", "").replace("$", "")
             try:
-                strike_ub = float(market['cap_strike'])
-            except:
-                strike_ub = None
-
-            market_type = market['market_type']
-            kalshi_market_ttm[title] = Market(
-                title, category, yes_price, no_price, close_time, market_type, exchange, strike_lb, strike_ub, link)
-
-        poly_market_ttm = {}
-
-        exchange = "poly"
-        for market in poly_ttm.values():
-            title = market['question']
-            category = market.get('category', '')
-            outcome_prices = json.loads(market.get("outcomePrices", "[]"))
-            yes_price = float(outcome_prices[0]) if outcome_prices else 0.0
-            no_price = float(outcome_prices[1]) if len(
-                outcome_prices) > 1 else 0.0
-            close_time = market.get('endDate', '')
-            slug = market['slug']
-            link = f"https://polymarket.com/market/{slug}"
-
-            group_item_title = market.get('groupItemTitle', '')
-            if len(group_item_title) > 0:
-                group_item_title = group_item_title.replace(
-                    ",", "").replace("$", "")
                 if group_item_title[0] == '<':
-                    strike_ub = int(group_item_title[1:])
-                    strike_lb = None
+                    return None, int(group_item_title[1:])
 
                 elif group_item_title[0] == '>':
-                    strike_ub = None
-                    strike_lb = int(group_item_title[1:])
+                    return int(group_item_title[1:]), None
 
                 elif '-' in group_item_title and group_item_title[0].isdigit():
                     prices = group_item_title.split('-')
-                    strike_lb = int(prices[0])
-                    strike_ub = int(prices[1])
+                    return int(prices[0]), int(prices[1])
 
                 elif group_item_title.isdigit():
-                    strike_ub = int(group_item_title)
-                    strike_lb = None
-
-                else:
-                    strike_ub, strike_lb = self.bounds_from_title(
-                        title)
-            else:
-                strike_ub, strike_lb = self.bounds_from_title(title)
-
-            #
-            # self.LOG(f"title = {title}")
-            # self.LOG(f"group_item_title = {group_item_title}")
-            # self.LOG(f"lower_bound = {strike_lb}")
-            # self.LOG(f"upper_bound = {strike_ub}")
-            # self.LOG("\n\n\n")
-
-            market_type = market.get('marketType', '')
-            poly_market_ttm[title] = Market(
-                title, category, yes_price, no_price, close_time, market_type, exchange, strike_lb, strike_ub, link)
+                    return None, int(group_item_title)
+            except ValueError:
+                pass
+
+        strike_ub, strike_lb = self.bounds_from_title(title)
+        return strike_lb, strike_ub
+
+    def title_tokens(self, title, strikes=()):
+        return extract_tokens(title, self._all_amounts_with_pos(title), strikes)
+
+    def format_kalshi_market(self, market):
+        # raw kalshi market -> Market, prices converted from cents to dollars
+        title = f"{market['title']} {market.get('yes_sub_title', '')}".strip()
+        category = market.get('category', '')
+        yes_ask = market.get('yes_ask')
+        no_ask = market.get('no_ask')
+        yes_price = float(yes_ask) / 100 if yes_ask is not None else None
+        no_price = float(no_ask) / 100 if no_ask is not None else None
+        close_time = market.get('close_time', '')
+
+        event_ticker = market.get('event_ticker', '')
+        series_ticker = event_ticker.split('-')[0]
+        link = f"https://kalshi.com/markets/{series_ticker.lower()}"
+
+        try:
+            strike_lb = float(market['floor_strike'])
+        except (KeyError, TypeError, ValueError):
+            strike_lb = None
+
+        try:
+            strike_ub = float(market['cap_strike'])
+        except (KeyError, TypeError, ValueError):
+            strike_ub = None
+
+        market_type = market.get('market_type', '')
+        return Market(title, category, yes_price, no_price, close_time, market_type, "kalshi",
+                      strike_lb, strike_ub, link, market.get('ticker', ''), event_ticker,
+                      self.parse_close_ts(close_time), market.get('status', ''))
+
+    def format_poly_market(self, market, event_id=''):
+        # raw poly market -> Market, outcomePrices decoded here and nowhere else
+        title = market['question']
+        category = market.get('category', '')
+        outcome_prices = loads(market.get("outcomePrices") or "[]")
+        yes_price = float(outcome_prices[0]) if outcome_prices else None
+        no_price = float(outcome_prices[1]) if len(
+            outcome_prices) > 1 else None
+        close_time = market.get('endDate', '')
+        slug = market.get('slug')
+        link = f"https://polymarket.com/market/{slug}" if slug else None
+
+        strike_lb, strike_ub = self.poly_strikes(
+            title, market.get('groupItemTitle') or '')
+
+        market_type = market.get('marketType', '')
+        status = "closed" if market.get('closed') else "open"
+        return Market(title, category, yes_price, no_price, close_time, market_type, "poly",
+                      strike_lb, strike_ub, link, str(market.get('id', '')), str(event_id),
+                      self.parse_close_ts(close_time), status)
+
+    def format_ttms(self, poly_ttm, kalshi_ttm):
+        # takes in market dictionaries and returns Market dictionaries keyed by market_key,
+        # so markets sharing a title stay apart. markets normalized at ingest are passed
+        # through, raw payloads are formatted here
+        kalshi_market_ttm = {}
+        for market in kalshi_ttm.values():
+            if not isinstance(market, Market):
+                market = self.format_kalshi_market(market)
+            kalshi_market_ttm[market_key(market)] = market
+
+        poly_market_ttm = {}
+        for market in poly_ttm.values():
+            if not isinstance(market, Market):
+                market = self.format_poly_market(market)
+            poly_market_ttm[market_key(market)] = market
 
         return kalshi_market_ttm, poly_market_ttm
+
+    def iter_markets(self, ttm, exchange):
+        # format_ttms one market at a time, for callers that never hold the whole universe
+        format_market = (self.format_kalshi_market if exchange == "kalshi"
+                         else self.format_poly_market)
+        for market in ttm.values():
+            yield market if isinstance(market, Market) else format_market(market)
@@ -0,0 +1,206 @@
+from snapshot import ColumnBuffer, encode_columns, FLOAT, STR
+import os
+import struct
+import threading
+import time
+import zlib
+
+# append-only time series of market quotes and pair edges.
+#
+# each stream lives in <directory>/<stream>.dat as a sequence of zlib
+# compressed column chunks (see snapshot.encode_columns). alongside it:
+#   <stream>.idx  one fixed record per chunk: offset, nbytes, n_rows, min_ts, max_ts
+#   <stream>.ids  one line per chunk: chunk number followed by the ids it contains
+# both indexes are append-only and loaded into memory when the store opens.
+
+HISTORY_DIR = os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "history")
+HISTORY_CHUNK_ROWS = 50_000
+HISTORY_FLUSH_INTERVAL = 5.0
+HISTORY_COMPRESS_LEVEL = 6
+
+QUOTE_COLUMNS = [("ts", FLOAT), ("market_id", STR), ("exchange", STR),
+                 ("yes_price", FLOAT), ("no_price", FLOAT)]
+EDGE_COLUMNS = [("ts", FLOAT), ("pair_id", STR), ("arbitrage", STR), ("edge", FLOAT),
+                ("kalshi_yes_price", FLOAT), ("kalshi_no_price", FLOAT),
+                ("poly_yes_price", FLOAT), ("poly_no_price", FLOAT)]
+
+_INDEX = struct.Struct("<QQIdd")
+
+
+class HistoryStream:
+    def __init__(self, directory, name, columns, id_column):
+        self.columns = columns
+        self.id_column = id_column
+        self._id_pos = [c[0] for c in columns].index(id_column)
+        self.data_path = os.path.join(directory, f"{name}.dat")
+        self.index_path = os.path.join(directory, f"{name}.idx")
+        self.ids_path = os.path.join(directory, f"{name}.ids")
+
+        self.buffer = []
+        self.chunks = []
+        self.id_to_chunks = {}
+        self._load_indexes()
+
+    def _load_indexes(self):
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                raw = f.read()
+            # a torn trailing record from a crash is ignored
+            usable = len(raw) - len(raw) % _INDEX.size
+            self.chunks = [_INDEX.unpack_from(raw, i)
+                           for i in range(0, usable, _INDEX.size)]
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    chunk_no = int(parts[0])
+                    if chunk_no >= len(self.chunks):
+                        continue
+                    for row_id in parts[1:]:
+                        self.id_to_chunks.setdefault(
+                            row_id, []).append(chunk_no)
+
+    def write_chunk(self, rows, level):
+        n_rows = len(rows)
+        values = list(zip(*rows))
+        payload = zlib.compress(encode_columns(n_rows, [
+            (name, kind, values[i]) for i, (name, kind) in enumerate(self.columns)]), level)
+
+        with open(self.data_path, "ab") as f:
+            offset = f.tell()
+            f.write(payload)
+
+        ts = values[0]
+        record = (offset, len(payload), n_rows, min(ts), max(ts))
+        chunk_no = len(self.chunks)
+        with open(self.index_path, "ab") as f:
+            f.write(_INDEX.pack(*record))
+        row_ids = sorted(set(values[self._id_pos]))
+        with open(self.ids_path, "a", encoding="utf-8") as f:
+            f.write("\t".join([str(chunk_no)] + row_ids) + "\n")
+
+        self.chunks.append(record)
+        for row_id in row_ids:
+            self.id_to_chunks.setdefault(row_id, []).append(chunk_no)
+
+    def read_chunk(self, chunk_no):
+        offset, nbytes, _, _, _ = self.chunks[chunk_no]
+        with open(self.data_path, "rb") as f:
+            f.seek(offset)
+            payload = zlib.decompress(f.read(nbytes))
+        chunk = ColumnBuffer(payload)
+        values = [chunk.values(name) for name, _ in self.columns]
+        chunk.release()
+        return values
+
+    def query(self, start_ts=None, end_ts=None, row_id=None):
+        # yields rows as dicts, chunks are picked from the indexes before any decompression
+        if row_id is not None:
+            candidates = self.id_to_chunks.get(row_id, [])
+        else:
+            candidates = range(len(self.chunks))
+
+        names = [name for name, _ in self.columns]
+        for chunk_no in candidates:
+            _, _, _, min_ts, max_ts = self.chunks[chunk_no]
+            if start_ts is not None and max_ts < start_ts:
+                continue
+            if end_ts is not None and min_ts > end_ts:
+                continue
+            values = self.read_chunk(chunk_no)
+            for row in zip(*values):
+                ts = row[0]
+                if start_ts is not None and ts < start_ts:
+                    continue
+                if end_ts is not None and ts > end_ts:
+                    continue
+                if row_id is not None and row[self._id_pos] != row_id:
+                    continue
+                yield dict(zip(names, row))
+
+
+class HistoryStore:
+    # record_* only appends to an in-memory buffer, a background thread
+    # compresses and writes full or stale buffers in chunks
+    def __init__(self, directory=HISTORY_DIR, chunk_rows=HISTORY_CHUNK_ROWS,
+                 flush_interval=HISTORY_FLUSH_INTERVAL, compress_level=HISTORY_COMPRESS_LEVEL):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.compress_level = compress_level
+        self.quotes = HistoryStream(directory, "quotes", QUOTE_COLUMNS, "market_id")
+        self.edges = HistoryStream(directory, "edges", EDGE_COLUMNS, "pair_id")
+
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def record_quote(self, market, ts=None):
+        ts = time.time() if ts is None else ts
+        row = (ts, market.market_id or market.title, market.exchange,
+               market.yes_price, market.no_price)
+        self._append(self.quotes, row)
+
+    def record_edge(self, pair, ts=None, removed=False):
+        # a removed pair is one row with arbitrage "removed"
+        ts = time.time() if ts is None else ts
+        row = (ts, pair.pair_id, "removed" if removed else pair.arbitrage, pair.edge,
+               pair.kalshi_yes_price, pair.kalshi_no_price,
+               pair.poly_yes_price, pair.poly_no_price)
+        self._append(self.edges, row)
+
+    def record_markets(self, markets, ts=None):
+        ts = time.time() if ts is None else ts
+        for market in markets:
+            self.record_quote(market, ts)
+
+    def record_pairs(self, pairs, ts=None):
+        ts = time.time() if ts is None else ts
+        for pair in pairs:
+            self.record_edge(pair, ts)
+
+    def _append(self, stream, row):
+        with self._lock:
+            stream.buffer.append(row)
+            full = len(stream.buffer) >= self.chunk_rows
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        # writes everything buffered so far, on the caller's thread
+        for stream in (self.quotes, self.edges):
+            with self._lock:
+                rows, stream.buffer = stream.buffer, []
+            with self._io_lock:
+                for i in range(0, len(rows), self.chunk_rows):
+                    stream.write_chunk(
+                        rows[i:i + self.chunk_rows], self.compress_level)
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"[ERROR] Failed to write history: {e}")
+
+    def query_quotes(self, start_ts=None, end_ts=None, market_id=None):
+        with self._io_lock:
+            return list(self.quotes.query(start_ts, end_ts, market_id))
+
+    def query_edges(self, start_ts=None, end_ts=None, pair_id=None):
+        with self._io_lock:
+            return list(self.edges.query(start_ts, end_ts, pair_id))
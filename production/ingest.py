@@ -0,0 +1,112 @@
+from format import Formatter
+from registry import is_expired
+from dataclasses import dataclass, field
+import time
+
+# raw fields that decide a market's record, anything else changing is ignored
+POLY_FINGERPRINT_FIELDS = ("question", "outcomePrices", "endDate", "closed",
+                           "groupItemTitle", "slug")
+KALSHI_FINGERPRINT_FIELDS = ("title", "yes_sub_title", "yes_ask", "no_ask", "close_time",
+                             "status", "floor_strike", "cap_strike")
+
+
+@dataclass
+class MarketDelta:
+    added: list = field(default_factory=list)
+    changed: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.added) + len(self.changed) + len(self.removed)
+
+
+def fingerprint(market, fields):
+    return tuple(market.get(name) for name in fields)
+
+
+class MarketIngestor:
+    # turns raw exchange payloads into normalized Market records exactly once,
+    # as each page arrives. everything downstream reads the records.
+    #
+    # between begin_cycle and end_cycle it also tracks which markets were
+    # added, changed or disappeared, unchanged payloads reuse the previous
+    # record without being normalized again. markets that arrive closed or
+    # past close are kept out of the delta, so one still listed isn't re-added
+    # and evicted every cycle
+    def __init__(self, formatter=None):
+        self.formatter = formatter if formatter is not None else Formatter()
+        self.fingerprints = {}
+        self.delta = MarketDelta()
+        self._seen = set()
+        self.complete = True
+        # keys whose current record is expired and was never handed downstream
+        self.expired = set()
+
+    def begin_cycle(self):
+        self.delta = MarketDelta()
+        self._seen = set()
+        self.complete = True
+
+    def mark_incomplete(self):
+        # a fetch failed part way, so markets missing this cycle may still be listed
+        self.complete = False
+
+    def end_cycle(self):
+        # anything not seen since begin_cycle was removed from the exchange listing,
+        # unless the cycle's fetch was incomplete
+        if not self.complete:
+            return self.delta
+        for key in list(self.fingerprints):
+            if key not in self._seen:
+                _, record = self.fingerprints.pop(key)
+                if key in self.expired:
+                    self.expired.discard(key)
+                    continue
+                self.delta.removed.append(record)
+        return self.delta
+
+    def _ingest(self, key, fp, build):
+        self._seen.add(key)
+        previous = self.fingerprints.get(key)
+        if previous is not None and previous[0] == fp:
+            return previous[1]
+
+        record = build()
+        self.fingerprints[key] = (fp, record)
+        if is_expired(record, time.time()):
+            if previous is not None and key not in self.expired:
+                self.delta.removed.append(previous[1])
+            self.expired.add(key)
+        elif previous is None or key in self.expired:
+            self.expired.discard(key)
+            self.delta.added.append(record)
+        else:
+            self.delta.changed.append(record)
+        return record
+
+    def ingest_poly_events(self, events):
+        # replaces each event's raw market list with normalized records in place
+        records = []
+        for event in events:
+            event_id = event.get('id', '')
+            event_records = []
+            for market in event.get('markets', []):
+                if isinstance(market, dict):
+                    market = self.ingest_poly_market(market, event_id)
+                event_records.append(market)
+            event['markets'] = event_records
+            records.extend(event_records)
+        return records
+
+    def ingest_poly_market(self, market, event_id=''):
+        return self._ingest(
+            f"poly:{market.get('id') or market['question']}",
+            fingerprint(market, POLY_FINGERPRINT_FIELDS) + (event_id,),
+            lambda: self.formatter.format_poly_market(market, event_id))
+
+    def ingest_kalshi_markets(self, markets):
+        return [self._ingest(
+            f"kalshi:{market.get('ticker') or market['title']}",
+            fingerprint(market, KALSHI_FINGERPRINT_FIELDS),
+            lambda market=market: self.formatter.format_kalshi_market(market))
+            for market in markets]
@@ -1,97 +1,278 @@
 from format import Formatter, Market
-from dataclasses import dataclass, asdict
-from datetime import datetime
-import json
 from api_interface import ArbitragePair
+from snapshot import SnapshotWriter
+from pair_registry import PairRegistry, market_key
+from strike_index import StrikeIndex, within_tolerance, strikes_match
+from range_arb import find_range_combinations
+from blocking import block_pairs
+from contract_key import hash_join
+from event_matching import group_by_event, pair_events, match_within_events
+from parallel import ShardPool
+from external import OutOfCoreMatcher
+from registry import MarketRegistry
+
+# markets close within this many seconds of each other to be paired
+CLOSE_WINDOW = 3 * 3600
+# relative strike difference still treated as the same strike
+STRIKE_TOLERANCE = 0.005
 
 
 class ComplexMatcher:
-    def __init__(self):
+    def __init__(self, close_window=CLOSE_WINDOW, tolerance_pct=STRIKE_TOLERANCE,
+                 write_snapshots=False, blocking=False, contract_join=False, event_first=False,
+                 workers=1, memory_budget=None):
         self.formatter = Formatter()
+        self.close_window = close_window
+        self.tolerance_pct = tolerance_pct
+        # start from token-blocked candidates instead of the full cross product. opt-in:
+        # the close-time scan stays faster on the fixtures and on 8x scaled copies of them
+        self.blocking = blocking
+        # structured categories: match by canonical contract key hash join
+        self.contract_join = contract_join
+        # pair events first, then compare markets only inside paired events
+        self.event_first = event_first
+        # format and match close-time shards in a process pool when workers > 1
+        self.shard_pool = ShardPool(workers) if workers > 1 else None
+        # join spilled, close-sorted markets from disk within this many bytes
+        self.memory_budget = memory_budget
+        self.enable_logs = True
+        # stage logs go to this Output when set, stdout otherwise
+        self.output = None
+        self.snapshot_writer = SnapshotWriter() if write_snapshots else None
+
+        # incremental state for apply_delta: the matched universe, keyed by market_key.
+        # it trails the extractors' registry until a delta is applied
+        self.markets = MarketRegistry()
+        self.strike_index = {"kalshi": StrikeIndex(close_window, tolerance_pct),
+                             "poly": StrikeIndex(close_window, tolerance_pct)}
+        self.pair_registry = PairRegistry()
+
+    def close(self):
+        # stops the shard pool's worker processes and drains the snapshot writer
+        if self.shard_pool is not None:
+            self.shard_pool.close()
+            self.shard_pool = None
+        if self.snapshot_writer is not None:
+            self.snapshot_writer.close()
+            self.snapshot_writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def LOG(self, msg):
+        if self.enable_logs == True:
+            if self.output is not None:
+                self.output.log(msg)
+            else:
+                print(msg)
 
     def match_pairs_by_close_time(self, kalshi_ttm, poly_ttm):
 
         matched_pairs = []
         for k_market in kalshi_ttm.values():
+            k_close = k_market.close_ts
+            if k_close is None:
+                continue
             for p_market in poly_ttm.values():
-                try:
-                    k_close = datetime.fromisoformat(k_market.close_time)
-                    p_close = datetime.fromisoformat(p_market.close_time)
-                except Exception:
+                p_close = p_market.close_ts
+                if p_close is None:
                     continue
-                # check if close times are within 3 hours
-                if abs((k_close - p_close).total_seconds()) <= 3 * 3600:
+                # check if close times are within the window (3 hours by default)
+                if abs(k_close - p_close) <= self.close_window:
                     matched_pairs.append((k_market, p_market))
         return matched_pairs
 
-    def within_tolerance(self, val1, val2, tolerance_pct=0.005):
-        if val1 == 0 and val2 == 0:
-            return True
-        avg = (abs(val1) + abs(val2)) / 2
-        return abs(val1 - val2) <= avg * tolerance_pct
+    def _ensure_tokens(self, kalshi_ttm, poly_ttm):
+        for market in list(kalshi_ttm.values()) + list(poly_ttm.values()):
+            if not market.tokens:
+                # tokens are only needed by blocking, contract_join and event_first,
+                # so they're extracted here once rather than for every market at ingest
+                market.tokens = self.formatter.title_tokens(
+                    market.title, (market.strike_lb, market.strike_ub))
 
-    def eliminate_pairs_by_strike(self, matched_pairs):
-        passed_matched_pairs = []
+    def get_candidate_pairs(self, kalshi_ttm, poly_ttm):
+        # blocked (kalshi, poly) candidates inside the close window, for this and any later matcher
+        self._ensure_tokens(kalshi_ttm, poly_ttm)
+        return block_pairs(kalshi_ttm.values(), poly_ttm.values(), self.close_window)
 
-        for k_market, p_market in matched_pairs:
-            k_lb = k_market.strike_lb
-            k_ub = k_market.strike_ub
-            p_lb = p_market.strike_lb
-            p_ub = p_market.strike_ub
+    def match_pairs_by_contract_key(self, kalshi_ttm, poly_ttm):
+        # exact contract equivalence, (underlying, shape, strikes, close time) within tolerance
+        self._ensure_tokens(kalshi_ttm, poly_ttm)
+        return hash_join(kalshi_ttm.values(), poly_ttm.values(),
+                         self.close_window, self.tolerance_pct)
 
-            # reject pairs where both have no strikes (unrelated markets)
-            if k_lb is None and k_ub is None and p_lb is None and p_ub is None:
-                continue
+    def match_pairs_out_of_core(self, kalshi_markets, poly_markets):
+        # same pairs as match_pairs_by_close_time, streamed from sorted runs on disk
+        with OutOfCoreMatcher(self.close_window, self.memory_budget) as matcher:
+            matcher.add_all(kalshi_markets)
+            matcher.add_all(poly_markets)
+            yield from matcher.pairs()
 
-            # check if strikes match same bound type or cross matched lb/ub
-            match_found = False
-
-            # same type matches: lb-lb or ub-ub
-            if k_lb is not None and p_lb is not None:
-                if self.within_tolerance(k_lb, p_lb):
-                    match_found = True
-            if k_ub is not None and p_ub is not None:
-                if self.within_tolerance(k_ub, p_ub):
-                    match_found = True
-
-            # cross type matches: k_lb ≈ p_ub or k_ub ≈ p_lb (same target, different parsing)
-            if k_lb is not None and p_ub is not None and p_lb is None and k_ub is None:
-                if self.within_tolerance(k_lb, p_ub):
-                    match_found = True
-            if k_ub is not None and p_lb is not None and p_ub is None and k_lb is None:
-                if self.within_tolerance(k_ub, p_lb):
-                    match_found = True
-
-            if not match_found:
-                continue
+    def match_pairs_by_event(self, kalshi_ttm, poly_ttm):
+        self._ensure_tokens(kalshi_ttm, poly_ttm)
+        event_pairs = pair_events(group_by_event(kalshi_ttm.values()),
+                                  group_by_event(poly_ttm.values()), self.close_window)
+        self.LOG(f"num matched event pairs: {len(event_pairs)}")
+        return match_within_events(event_pairs, self.close_window)
+
+    def within_tolerance(self, val1, val2, tolerance_pct=None):
+        if tolerance_pct is None:
+            tolerance_pct = self.tolerance_pct
+        return within_tolerance(val1, val2, tolerance_pct)
+
+    def eliminate_pairs_by_strike(self, matched_pairs):
+        passed_matched_pairs = []
 
-            passed_matched_pairs.append((k_market, p_market))
+        for k_market, p_market in matched_pairs:
+            if strikes_match(k_market.strike_lb, k_market.strike_ub,
+                             p_market.strike_lb, p_market.strike_ub, self.tolerance_pct):
+                passed_matched_pairs.append((k_market, p_market))
 
         return passed_matched_pairs
 
     def get_matching_pairs(self, poly_ttm, kalshi_ttm):
 
+        if self.shard_pool is not None:
+            return self.get_matching_pairs_parallel(poly_ttm, kalshi_ttm)
+        if self.memory_budget is not None:
+            return self.get_matching_pairs_out_of_core(poly_ttm, kalshi_ttm)
+
         kalshi_market_ttm, poly_market_ttm = self.formatter.format_ttms(
             poly_ttm, kalshi_ttm)
 
-        matched_pairs = self.match_pairs_by_close_time(
-            kalshi_market_ttm, poly_market_ttm)
+        if self.contract_join:
+            matched_pairs = self.match_pairs_by_contract_key(
+                kalshi_market_ttm, poly_market_ttm)
+        elif self.event_first:
+            matched_pairs = self.match_pairs_by_event(
+                kalshi_market_ttm, poly_market_ttm)
+        elif self.blocking:
+            matched_pairs = self.get_candidate_pairs(
+                kalshi_market_ttm, poly_market_ttm)
+        else:
+            matched_pairs = self.match_pairs_by_close_time(
+                kalshi_market_ttm, poly_market_ttm)
 
-        print(f"num matched pairs after close time: {len(matched_pairs)}")
+        self.LOG(f"num matched pairs after close time: {len(matched_pairs)}")
 
-        with open('poly_market_ttm.json', 'w') as f:
-            json.dump({k: asdict(v) for k, v in poly_market_ttm.items()}, f)
-        with open('kalshi_market_ttm.json', 'w') as f:
-            json.dump({k: asdict(v) for k, v in kalshi_market_ttm.items()}, f)
+        # persisted off the hot path, see snapshot.py
+        if self.snapshot_writer is not None:
+            self.snapshot_writer.write(kalshi_market_ttm, poly_market_ttm)
 
         matched_pairs = self.eliminate_pairs_by_strike(matched_pairs)
-        print(f"num matched pairs after strike: {len(matched_pairs)}")
+        self.LOG(f"num matched pairs after strike: {len(matched_pairs)}")
 
+        return self.build_arb_pairs(matched_pairs)
+
+    def get_matching_pairs_parallel(self, poly_ttm, kalshi_ttm):
+        kalshi_market_ttm, poly_market_ttm = self.shard_pool.format_ttms(
+            poly_ttm, kalshi_ttm)
+
+        if self.snapshot_writer is not None:
+            self.snapshot_writer.write(kalshi_market_ttm, poly_market_ttm)
+
+        # close window and strike checks both run inside the shard workers
+        matched_pairs = self.shard_pool.match(
+            kalshi_market_ttm, poly_market_ttm, self.close_window, self.tolerance_pct)
+        self.LOG(f"num matched pairs after strike: {len(matched_pairs)}")
+
+        return self.build_arb_pairs(matched_pairs)
+
+    def get_matching_pairs_out_of_core(self, poly_ttm, kalshi_ttm):
+        # markets are formatted one at a time as they are spilled and the close-time pairs
+        # filtered as they stream, so neither is held as a whole. a snapshot would need
+        # the full formatted universe, so none is written in this mode
+        matched_pairs = self.eliminate_pairs_by_strike(self.match_pairs_out_of_core(
+            self.formatter.iter_markets(kalshi_ttm, "kalshi"),
+            self.formatter.iter_markets(poly_ttm, "poly")))
+        self.LOG(f"num matched pairs after strike: {len(matched_pairs)}")
+
+        return self.build_arb_pairs(matched_pairs)
+
+    def build_arb_pairs(self, matched_pairs):
         pair_list = []
         for k, p in matched_pairs:
-            arb_pair = ArbitragePair(
-                k.title, k.yes_price, k.no_price, k.link, p.title, p.yes_price, p.no_price, p.link)
-            pair_list.append(arb_pair)
-            print(arb_pair)
+            if None in (k.yes_price, k.no_price, p.yes_price, p.no_price):
+                continue
+            pair_list.append(ArbitragePair.from_markets(k, p))
 
         return pair_list
+
+    def get_range_combinations(self, kalshi_markets, poly_markets):
+        # multi-bucket ladders on either exchange tiling a single market on the other
+        kalshi_markets = list(kalshi_markets)
+        poly_markets = list(poly_markets)
+        combinations = find_range_combinations(
+            kalshi_markets, poly_markets, self.close_window)
+        combinations += find_range_combinations(
+            poly_markets, kalshi_markets, self.close_window)
+        self.LOG(f"num range combinations: {len(combinations)}")
+        return combinations
+
+    # incremental matching: only markets in a delta are re-matched, by querying
+    # the other exchange's strike index for equivalent strikes inside the close window
+
+    def _remove_market(self, market):
+        key = market_key(market)
+        old = self.markets.remove(key)
+        if old is None:
+            return
+        self.strike_index[market.exchange].remove(key)
+        self.pair_registry.remove_market(key)
+
+    def _add_market(self, market):
+        key = market_key(market)
+        self.markets.add(market)
+        self.strike_index[market.exchange].add(key, market)
+
+        other_side = "poly" if market.exchange == "kalshi" else "kalshi"
+        matches = self.strike_index[other_side].equivalent(
+            market, self.close_window)
+        for other_key in matches:
+            other = self.markets[other_key]
+            k, p = (market, other) if market.exchange == "kalshi" else (other, market)
+            if None in (k.yes_price, k.no_price, p.yes_price, p.no_price):
+                continue
+            self.pair_registry.add(ArbitragePair.from_markets(k, p),
+                                   market_key(k), market_key(p))
+
+    def _same_match_fields(self, old, new):
+        # a market unpriced before was never paired, so gaining prices is a match change
+        return (old.close_ts == new.close_ts and old.strike_lb == new.strike_lb
+                and old.strike_ub == new.strike_ub
+                and None not in (old.yes_price, old.no_price, new.yes_price, new.no_price))
+
+    def update_quote(self, market):
+        # a changed market whose match fields are untouched only needs its pairs re-scored
+        key = market_key(market)
+        old = self.markets.get(key)
+        if old is not None and self._same_match_fields(old, market):
+            self.markets.add(market)
+            return self.pair_registry.update_quote(market)
+        self._remove_market(market)
+        self._add_market(market)
+        return self.pair_registry.pairs_for(market)
+
+    def apply_delta(self, kalshi_delta, poly_delta):
+        # updates the pair set from the markets that were added, changed or removed
+        for delta in (kalshi_delta, poly_delta):
+            for market in delta.removed:
+                self._remove_market(market)
+        for delta in (kalshi_delta, poly_delta):
+            for market in delta.changed:
+                self.update_quote(market)
+            for market in delta.added:
+                self._remove_market(market)
+                self._add_market(market)
+
+        self.LOG(f"applied delta: {len(kalshi_delta)} kalshi, {len(poly_delta)} poly, "
+                 f"{len(self.pair_registry)} matched pairs")
+
+        if self.snapshot_writer is not None and (len(kalshi_delta) or len(poly_delta)):
+            self.snapshot_writer.write(
+                self.markets.for_exchange("kalshi"), self.markets.for_exchange("poly"))
+
+        return list(self.pair_registry.pairs.values())
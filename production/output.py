@@ -0,0 +1,181 @@
+import json
+import queue
+import socket
+import sys
+import threading
+import time
+
+# pluggable output for scan results.
+#
+# the scan thread only enqueues (kind, ts, payload) events. a background
+# thread turns them into records, renders text and writes every sink, so
+# formatting and I/O never run inside the matching loops. event kinds:
+#   pairs   leaderboard, list of ArbitragePair
+#   ranges  list of RangeCombination
+#   edge    (pair, removed) whenever a pair's edge moves or the pair goes away
+#   log     stage message
+
+JSONL_BUFFER_ROWS = 1000
+PUBLISH_HOST = "127.0.0.1"
+# a subscriber that can't take a line within this many seconds is dropped
+PUBLISH_SEND_TIMEOUT = 1.0
+
+
+def to_record(kind, ts, payload):
+    if kind in ("pairs", "ranges"):
+        return {"kind": kind, "ts": ts, "items": [item.to_record() for item in payload]}
+    if kind == "edge":
+        pair, removed = payload
+        return {"kind": kind, "ts": ts, "removed": removed, **pair.to_record()}
+    return {"kind": kind, "ts": ts, "msg": str(payload)}
+
+
+class SummarySink:
+    # human readable leaderboard and stage logs, one write per event
+    needs_record = False
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+
+    def write(self, kind, payload, record):
+        if kind == "pairs":
+            text = "Arb Pairs:\n" + "".join(pair.render() for pair in payload)
+        elif kind == "ranges":
+            if not payload:
+                return
+            text = "Range Combinations:\n" + "".join(c.render() for c in payload)
+        elif kind == "log":
+            text = f"{payload}\n"
+        else:
+            return
+        self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+
+class JsonlSink:
+    # every event as one json line, written in batches
+    needs_record = True
+
+    def __init__(self, path, buffer_rows=JSONL_BUFFER_ROWS):
+        self.path = path
+        self.buffer_rows = buffer_rows
+        self._lines = []
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, kind, payload, record):
+        self._lines.append(json.dumps(record) + "\n")
+        if len(self._lines) >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        if self._lines:
+            self._file.writelines(self._lines)
+            self._lines = []
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class SocketPublisher:
+    # local pub/sub: every subscriber connected to host:port receives each
+    # event as a json line. port 0 picks a free port, see self.address
+    needs_record = True
+
+    def __init__(self, port=0, host=PUBLISH_HOST):
+        self._server = socket.create_server((host, port))
+        self.address = self._server.getsockname()
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._accept, name="output-publisher", daemon=True)
+        self._thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            conn.settimeout(PUBLISH_SEND_TIMEOUT)
+            with self._lock:
+                self._subscribers.append(conn)
+
+    def write(self, kind, payload, record):
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for conn in subscribers:
+            try:
+                conn.sendall(line)
+            except OSError:
+                self._drop(conn)
+
+    def _drop(self, conn):
+        with self._lock:
+            if conn in self._subscribers:
+                self._subscribers.remove(conn)
+        conn.close()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self._server.close()
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, []
+        for conn in subscribers:
+            conn.close()
+
+
+class Output:
+    def __init__(self, sinks=None):
+        self.sinks = sinks if sinks is not None else [SummarySink()]
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="output", daemon=True)
+        self._thread.start()
+
+    def publish(self, kind, payload):
+        # lists are copied so the scan thread can keep mutating its own
+        if isinstance(payload, list):
+            payload = list(payload)
+        self._queue.put((kind, time.time(), payload))
+
+    def log(self, msg):
+        self.publish("log", msg)
+
+    def flush(self):
+        self._queue.join()
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        for sink in self.sinks:
+            sink.close()
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            try:
+                if event is None:
+                    return
+                kind, ts, payload = event
+                record = None
+                if any(sink.needs_record for sink in self.sinks):
+                    record = to_record(kind, ts, payload)
+                for sink in self.sinks:
+                    try:
+                        sink.write(kind, payload, record)
+                    except (OSError, ValueError, TypeError) as e:
+                        print(f"[ERROR] Failed to write {kind} to {type(sink).__name__}: {e}")
+            finally:
+                self._queue.task_done()
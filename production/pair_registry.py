@@ -0,0 +1,72 @@
+# reverse index from each market to the pairs that contain it, so a quote
+# update re-scores only the affected pairs instead of rebuilding all of them
+
+# edge moves smaller than this are not published to listeners
+EDGE_EPSILON = 0.0005
+
+
+def market_key(market):
+    return f"{market.exchange}:{market.market_id or market.title}"
+
+
+class PairRegistry:
+    def __init__(self, epsilon=EDGE_EPSILON):
+        self.epsilon = epsilon
+        self.pairs = {}
+        self.market_pairs = {}
+        self.listeners = []
+        # last edge and direction published per pair
+        self._published = {}
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def subscribe(self, callback):
+        # callback(pair) for every pair whose edge moved by at least epsilon,
+        # callback(pair, removed=True) when a pair goes away
+        self.listeners.append(callback)
+
+    def add(self, pair, k_key, p_key):
+        pair_key = (k_key, p_key)
+        self.pairs[pair_key] = pair
+        self.market_pairs.setdefault(k_key, set()).add(pair_key)
+        self.market_pairs.setdefault(p_key, set()).add(pair_key)
+        self._publish(pair)
+
+    def remove_market(self, key):
+        for pair_key in self.market_pairs.pop(key, ()):
+            pair = self.pairs.pop(pair_key, None)
+            for other in pair_key:
+                if other != key and other in self.market_pairs:
+                    self.market_pairs[other].discard(pair_key)
+            if pair is not None:
+                self._published.pop(pair.pair_id, None)
+                for callback in self.listeners:
+                    callback(pair, removed=True)
+
+    def pairs_for(self, market):
+        return [self.pairs[pair_key] for pair_key in self.market_pairs.get(market_key(market), ())]
+
+    def update_quote(self, market):
+        # re-scores the pairs containing market, returns the ones that were published
+        published = []
+        for pair_key in self.market_pairs.get(market_key(market), ()):
+            pair = self.pairs[pair_key]
+            if market.exchange == "kalshi":
+                pair.update_prices(kalshi_yes_price=market.yes_price,
+                                   kalshi_no_price=market.no_price)
+            else:
+                pair.update_prices(poly_yes_price=market.yes_price,
+                                   poly_no_price=market.no_price)
+            if self._publish(pair):
+                published.append(pair)
+        return published
+
+    def _publish(self, pair):
+        last = self._published.get(pair.pair_id)
+        if last is not None and last[1] == pair.arbitrage and abs(pair.edge - last[0]) < self.epsilon:
+            return False
+        self._published[pair.pair_id] = (pair.edge, pair.arbitrage)
+        for callback in self.listeners:
+            callback(pair)
+        return True
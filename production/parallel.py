@@ -0,0 +1,171 @@
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from format import Formatter, Market
+from snapshot import FLOAT, ColumnBuffer, encode_columns, encode_markets
+from strike_index import strikes_match
+from pair_registry import market_key
+
+# parallel formatting and matching over close-time shards.
+#
+# raw payloads are formatted in chunks and come back as column files instead
+# of pickled Market objects. for matching, close_ts and strikes of both
+# exchanges are packed into one shared memory block; each worker gets the
+# block name plus the row numbers of its shard and returns matched row pairs
+# as two uint32 arrays. a kalshi market belongs to exactly one shard (by its
+# close bucket) while poly markets are copied into every shard their close
+# time reaches within the match window, so shards never produce duplicates.
+
+PARALLEL_WORKERS = os.cpu_count() or 1
+# close-time width of one shard in seconds
+SHARD_WIDTH = 24 * 3600
+# raw markets per formatting task
+FORMAT_CHUNK = 2000
+
+_MATCH_COLUMNS = ("close_ts", "strike_lb", "strike_ub")
+_NAN = float("nan")
+
+
+def _format_chunk(exchange, raw_markets):
+    formatter = Formatter()
+    if exchange == "kalshi":
+        markets = [formatter.format_kalshi_market(m) for m in raw_markets]
+    else:
+        markets = [formatter.format_poly_market(m) for m in raw_markets]
+    return encode_markets(markets)
+
+
+def _decode_markets(data):
+    columns = ColumnBuffer(data)
+    try:
+        values = {name: columns.values(name) for name in columns.columns}
+    finally:
+        columns.release()
+    return [Market(**{name: col[i] for name, col in values.items()})
+            for i in range(columns.n_rows)]
+
+
+def _rows(data):
+    rows = array("I")
+    rows.frombytes(data)
+    return rows
+
+
+def _encode_match_columns(markets):
+    return encode_columns(len(markets), [
+        (name, FLOAT, [_NAN if getattr(m, name) is None else getattr(m, name)
+                       for m in markets])
+        for name in _MATCH_COLUMNS])
+
+
+def _match_shard(shm_name, kalshi_offset, poly_offset, kalshi_rows, poly_rows,
+                 close_window, tolerance_pct):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    k_cols = ColumnBuffer(shm.buf[kalshi_offset:])
+    p_cols = ColumnBuffer(shm.buf[poly_offset:])
+    try:
+        k_close, k_lb, k_ub = [k_cols.column(name) for name in _MATCH_COLUMNS]
+        p_close, p_lb, p_ub = [p_cols.column(name) for name in _MATCH_COLUMNS]
+
+        # poly rows sorted by close time so each kalshi row scans only its window
+        poly_rows = sorted(_rows(poly_rows), key=p_close.__getitem__)
+        poly_closes = [p_close[j] for j in poly_rows]
+
+        k_out = array("I")
+        p_out = array("I")
+        for i in _rows(kalshi_rows):
+            close = k_close[i]
+            kl = None if k_lb[i] != k_lb[i] else k_lb[i]
+            ku = None if k_ub[i] != k_ub[i] else k_ub[i]
+            lo = bisect_left(poly_closes, close - close_window)
+            hi = bisect_right(poly_closes, close + close_window)
+            for j in poly_rows[lo:hi]:
+                pl = None if p_lb[j] != p_lb[j] else p_lb[j]
+                pu = None if p_ub[j] != p_ub[j] else p_ub[j]
+                if strikes_match(kl, ku, pl, pu, tolerance_pct):
+                    k_out.append(i)
+                    p_out.append(j)
+        del k_close, k_lb, k_ub, p_close, p_lb, p_ub
+        return k_out.tobytes(), p_out.tobytes()
+    finally:
+        k_cols.release()
+        p_cols.release()
+        shm.close()
+
+
+def shard_rows(kalshi_closes, poly_closes, close_window, shard_width=SHARD_WIDTH):
+    # shard id -> (kalshi rows, poly rows); poly shards overlap by the match window
+    shards = {}
+    for i, close in enumerate(kalshi_closes):
+        shards.setdefault(int(close // shard_width), (array("I"), array("I")))[0].append(i)
+    for j, close in enumerate(poly_closes):
+        first = int((close - close_window) // shard_width)
+        last = int((close + close_window) // shard_width)
+        for shard in range(first, last + 1):
+            if shard in shards:
+                shards[shard][1].append(j)
+    return shards
+
+
+class ShardPool:
+    # long lived process pool for formatting and shard matching
+    def __init__(self, workers=PARALLEL_WORKERS, shard_width=SHARD_WIDTH):
+        self.workers = workers
+        self.shard_width = shard_width
+        self._pool = ProcessPoolExecutor(max_workers=workers)
+
+    def format_ttms(self, poly_ttm, kalshi_ttm):
+        # same result as Formatter.format_ttms, raw payloads formatted in the pool
+        formatted = {}
+        for exchange, ttm in (("kalshi", kalshi_ttm), ("poly", poly_ttm)):
+            records = [m for m in ttm.values() if isinstance(m, Market)]
+            raw = [m for m in ttm.values() if not isinstance(m, Market)]
+            futures = [self._pool.submit(_format_chunk, exchange, raw[i:i + FORMAT_CHUNK])
+                       for i in range(0, len(raw), FORMAT_CHUNK)]
+            for future in futures:
+                records.extend(_decode_markets(future.result()))
+            formatted[exchange] = {market_key(m): m for m in records}
+        return formatted["kalshi"], formatted["poly"]
+
+    def match(self, kalshi_ttm, poly_ttm, close_window, tolerance_pct):
+        # (kalshi, poly) pairs inside the close window with equivalent strikes
+        kalshi = [m for m in kalshi_ttm.values() if m.close_ts is not None]
+        poly = [m for m in poly_ttm.values() if m.close_ts is not None]
+        if not kalshi or not poly:
+            return []
+
+        k_data = _encode_match_columns(kalshi)
+        p_data = _encode_match_columns(poly)
+        shm = shared_memory.SharedMemory(create=True, size=len(k_data) + len(p_data))
+        try:
+            shm.buf[:len(k_data)] = k_data
+            shm.buf[len(k_data):len(k_data) + len(p_data)] = p_data
+
+            shards = shard_rows([m.close_ts for m in kalshi], [m.close_ts for m in poly],
+                                close_window, self.shard_width)
+            futures = [self._pool.submit(_match_shard, shm.name, 0, len(k_data),
+                                         k_rows.tobytes(), p_rows.tobytes(),
+                                         close_window, tolerance_pct)
+                       for k_rows, p_rows in shards.values() if p_rows]
+
+            pairs = []
+            for future in futures:
+                k_out, p_out = future.result()
+                pairs.extend((kalshi[i], poly[j])
+                             for i, j in zip(_rows(k_out), _rows(p_out)))
+            return pairs
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def close(self):
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,162 @@
+from collections import Counter
+from datetime import datetime, timezone
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+# opt-in per stage profiling for the Engine.
+#
+# every wrapped stage runs with a stack sampler on a side thread (reads the
+# stage thread's frame every SAMPLE_INTERVAL, no tracing hooks) and with
+# tracemalloc. each stage call writes a report with self and inclusive sample
+# counts per function, peak traced memory and the top allocation sites grown
+# since the previous stage. stages running concurrently (warm start refreshes
+# next to discovery) share tracemalloc, so their memory numbers overlap.
+
+PROFILE_DIR = os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "profiles")
+SAMPLE_INTERVAL = 0.005
+REPORT_TOP = 25
+# frames kept per allocation, more is more precise and slower
+TRACE_FRAMES = 1
+ENGINE_STAGES = ("get_markets", "get_matching_markets", "get_arb_pair_list",
+                 "get_range_combinations", "print_arb_pairs", "refresh_quotes")
+
+
+def _frame_key(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.self_counts = Counter()
+        self.inclusive_counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            self.self_counts[_frame_key(frame)] += 1
+            seen = set()
+            while frame is not None:
+                key = _frame_key(frame)
+                if key not in seen:
+                    seen.add(key)
+                    self.inclusive_counts[key] += 1
+                frame = frame.f_back
+
+
+class StageProfiler:
+    def __init__(self, run_dir=None, interval=SAMPLE_INTERVAL, top=REPORT_TOP,
+                 trace_frames=TRACE_FRAMES):
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        self.run_dir = run_dir or os.path.join(PROFILE_DIR, f"run-{stamp}")
+        os.makedirs(self.run_dir, exist_ok=True)
+        self.interval = interval
+        self.top = top
+        self.calls = Counter()
+        self.stats = {}
+        self._lock = threading.Lock()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(trace_frames)
+        self._last_snapshot = self._snapshot()
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def stage(self, name, func):
+        def profiled(*args, **kwargs):
+            return self.run_stage(name, func, *args, **kwargs)
+        profiled.__wrapped__ = func
+        return profiled
+
+    def wrap(self, obj, stages):
+        # shadows each bound stage method with its profiled version
+        for name in stages:
+            setattr(obj, name, self.stage(name, getattr(obj, name)))
+
+    def run_stage(self, name, func, *args, **kwargs):
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        tracemalloc.reset_peak()
+        start_mem = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            wall = time.perf_counter() - start
+            sampler.stop()
+            current, peak = tracemalloc.get_traced_memory()
+            self._report(name, wall, sampler, start_mem, current, peak)
+
+    def _report(self, name, wall, sampler, start_mem, current, peak):
+        with self._lock:
+            snapshot = self._snapshot()
+            growth = snapshot.compare_to(self._last_snapshot, "lineno")[:self.top]
+            self._last_snapshot = snapshot
+            self.calls[name] += 1
+            call = self.calls[name]
+
+            record = {"stage": name, "call": call, "wall_s": wall, "samples": sampler.samples,
+                      "start_bytes": start_mem, "end_bytes": current, "peak_bytes": peak}
+            stats = self.stats.setdefault(name, {"calls": 0, "wall_s": 0.0, "peak_bytes": 0})
+            stats["calls"] += 1
+            stats["wall_s"] += wall
+            stats["peak_bytes"] = max(stats["peak_bytes"], peak)
+
+            lines = [f"stage {name} call {call}",
+                     f"wall {wall * 1000:.1f}ms, {sampler.samples} samples "
+                     f"every {self.interval * 1000:.1f}ms",
+                     f"traced memory {start_mem / 1e6:.1f}MB -> {current / 1e6:.1f}MB, "
+                     f"peak {peak / 1e6:.1f}MB", ""]
+            for title, counts in (("self samples", sampler.self_counts),
+                                  ("inclusive samples", sampler.inclusive_counts)):
+                lines.append(title)
+                for key, n in counts.most_common(self.top):
+                    lines.append(f"  {n:7d} {n / max(sampler.samples, 1):7.1%}  {key}")
+                lines.append("")
+            lines.append("top allocation growth since the previous stage")
+            for diff in growth:
+                frame = diff.traceback[0]
+                lines.append(f"  {diff.size_diff / 1e3:+10.1f}KB {diff.count_diff:+8d} blocks  "
+                             f"{frame.filename}:{frame.lineno}")
+
+            path = os.path.join(self.run_dir, f"{name}-{call:04d}.txt")
+            with open(path, "w") as f:
+                f.write("\n".join(lines) + "\n")
+            with open(os.path.join(self.run_dir, "stages.jsonl"), "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def close(self):
+        # per stage totals, slowest first
+        lines = [f"{'stage':<24} {'calls':>6} {'total_s':>9} {'mean_ms':>9} {'peak_MB':>9}"]
+        for name, stats in sorted(self.stats.items(), key=lambda item: -item[1]["wall_s"]):
+            lines.append(f"{name:<24} {stats['calls']:>6} {stats['wall_s']:>9.2f} "
+                         f"{stats['wall_s'] / stats['calls'] * 1000:>9.1f} "
+                         f"{stats['peak_bytes'] / 1e6:>9.1f}")
+        with open(os.path.join(self.run_dir, "summary.txt"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+        tracemalloc.stop()
+        return self.run_dir
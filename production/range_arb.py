@@ -0,0 +1,159 @@
+from bisect import bisect_left, bisect_right
+import math
+
+# multi-bucket range arbitrage: a contiguous run of range buckets on one
+# exchange that exactly tiles a threshold or range on the other is the same
+# contract. each ladder is sorted once with prefix sums of yes prices, so the
+# price of any run is a subtraction and no subsets are enumerated.
+
+_INF = math.inf
+# gap between one bucket's cap and the next bucket's floor still treated as
+# contiguous, kalshi ladders step from 95,999.99 to 96,000
+CONTIGUITY_GAP = 0.01
+# x - (x - 0.01) comes out slightly above 0.01 at most price levels
+_FLOAT_SLACK = 1e-6
+
+
+class Ladder:
+    def __init__(self, markets, contiguity_gap=CONTIGUITY_GAP):
+        markets = sorted(markets, key=lambda m: (
+            m.strike_lb if m.strike_lb is not None else -_INF))
+        self.markets = markets
+        self.contiguity_gap = contiguity_gap
+        # widest difference between two edges still treated as the same strike
+        self.radius = contiguity_gap + _FLOAT_SLACK
+        self.close_ts = markets[0].close_ts
+        self.lbs = [m.strike_lb if m.strike_lb is not None else -_INF for m in markets]
+        self.ubs = [m.strike_ub if m.strike_ub is not None else _INF for m in markets]
+
+        # prefix sums of yes prices and the contiguous run each bucket belongs to
+        self.prefix = [0.0]
+        self.run_id = []
+        self.run_bounds = []
+        run = -1
+        for i, market in enumerate(markets):
+            self.prefix.append(self.prefix[-1] + market.yes_price)
+            if i == 0 or abs(self.lbs[i] - self.ubs[i - 1]) > self.radius:
+                run += 1
+                self.run_bounds.append([i, i])
+            self.run_bounds[run][1] = i
+            self.run_id.append(run)
+
+    def price(self, i, j):
+        return self.prefix[j + 1] - self.prefix[i]
+
+    def _find(self, array, value):
+        # index of the bucket edge equal to value up to the contiguity gap, None if
+        # there isn't one. a percentage radius would let a ladder ending a bucket
+        # away from the target strike pass as the same contract
+        if math.isinf(value):
+            i = bisect_left(array, value)
+            return i if i < len(array) and array[i] == value else None
+        lo = bisect_left(array, value - self.radius)
+        hi = bisect_right(array, value + self.radius)
+        if lo == hi:
+            return None
+        return min(range(lo, hi), key=lambda i: abs(array[i] - value))
+
+    def tile(self, lb, ub):
+        # (i, j) when buckets i..j exactly cover [lb, ub], None otherwise
+        i = self._find(self.lbs, -_INF if lb is None else lb)
+        j = self._find(self.ubs, _INF if ub is None else ub)
+        if i is None or j is None or i >= j or self.run_id[i] != self.run_id[j]:
+            return None
+        return i, j
+
+
+class RangeCombination:
+    # "basket": buy yes on every bucket in the run and no on the target
+    # "complement": buy yes on the target and yes on every other bucket of a
+    # ladder that spans the whole line. either way exactly one leg pays $1
+    def __init__(self, target, buckets, direction, cost):
+        self.target = target
+        self.buckets = buckets
+        self.direction = direction
+        self.cost = cost
+        self.edge = max(0.0, 1 - cost)
+        self.arbitrage = direction if cost < 1 else "none"
+
+    @property
+    def pair_id(self):
+        legs = ",".join(m.market_id or m.title for m in self.buckets)
+        return f"{self.target.market_id or self.target.title}|{legs}"
+
+    def to_record(self):
+        def leg(market):
+            return {"exchange": market.exchange, "id": market.market_id or market.title,
+                    "title": market.title, "yes": market.yes_price, "no": market.no_price,
+                    "link": market.link}
+        return {"pair_id": self.pair_id, "arbitrage": self.arbitrage, "edge": self.edge,
+                "direction": self.direction, "cost": self.cost,
+                "target": leg(self.target), "buckets": [leg(m) for m in self.buckets]}
+
+    def render(self):
+        if self.arbitrage == "none":
+            return ""
+        lines = ["=" * 80]
+        lines.append(f"\n{self.target.exchange.upper()} TARGET")
+        lines.append(f"  Title: {self.target.title}")
+        lines.append(f"  YES:   {self.target.yes_price:.4f}")
+        lines.append(f"  NO:    {self.target.no_price:.4f}")
+        lines.append(f"  LINK:  {self.target.link}")
+        lines.append(f"\n{self.buckets[0].exchange.upper()} BUCKETS ({len(self.buckets)})")
+        for market in self.buckets:
+            lines.append(f"  {market.yes_price:.4f}  {market.title}")
+        if self.direction == "basket":
+            lines.append("\nBuy yes on every bucket, No on the target\n")
+        else:
+            lines.append("\nBuy yes on the target and on every bucket listed\n")
+        lines.append(f"Edge = {self.edge:.4%}\n")
+        lines.append("=" * 80)
+        return "\n".join(lines) + "\n"
+
+    def print(self):
+        print(self.render(), end="")
+
+
+def _priced_with_strike(market):
+    return (market.close_ts is not None and market.yes_price is not None
+            and market.no_price is not None
+            and (market.strike_lb is not None or market.strike_ub is not None))
+
+
+def build_ladders(markets, contiguity_gap=CONTIGUITY_GAP):
+    # groups one exchange's priced markets with at least one strike by event, falling back to close time
+    groups = {}
+    for market in markets:
+        if not _priced_with_strike(market):
+            continue
+        groups.setdefault(market.event_id or market.close_time, []).append(market)
+    return [Ladder(group, contiguity_gap) for group in groups.values() if len(group) > 1]
+
+
+def find_range_combinations(ladder_markets, target_markets, close_window):
+    # ladders from one exchange against thresholds and ranges on the other
+    targets = sorted((m for m in target_markets if _priced_with_strike(m)),
+                     key=lambda m: m.close_ts)
+    target_close = [m.close_ts for m in targets]
+
+    combinations = []
+    for ladder in build_ladders(ladder_markets):
+        lo = bisect_left(target_close, ladder.close_ts - close_window)
+        hi = bisect_right(target_close, ladder.close_ts + close_window)
+        for target in targets[lo:hi]:
+            span = ladder.tile(target.strike_lb, target.strike_ub)
+            if span is None:
+                continue
+
+            i, j = span
+            inside = ladder.price(i, j)
+            combinations.append(RangeCombination(
+                target, ladder.markets[i:j + 1], "basket", inside + target.no_price))
+
+            run_start, run_end = ladder.run_bounds[ladder.run_id[i]]
+            outside = ladder.markets[run_start:i] + ladder.markets[j + 1:run_end + 1]
+            if outside and ladder.lbs[run_start] == -_INF and ladder.ubs[run_end] == _INF:
+                combinations.append(RangeCombination(
+                    target, outside, "complement",
+                    ladder.price(run_start, run_end) - inside + target.yes_price))
+    return combinations
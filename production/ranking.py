@@ -0,0 +1,111 @@
+import heapq
+
+# incremental leaderboard of arbitrage pairs, best edge first.
+#
+# an indexed binary max-heap on edge: pair_id -> heap position, so a single
+# pair's edge can be updated or removed in O(log n) without rebuilding or
+# re-sorting the whole list
+
+LEADERBOARD_SIZE = 50
+
+
+class EdgeRanking:
+    def __init__(self, k=LEADERBOARD_SIZE):
+        self.k = k
+        self._heap = []
+        self._pos = {}
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, pair_id):
+        return pair_id in self._pos
+
+    def update(self, pair):
+        # inserts, moves or removes a pair depending on its current edge
+        if pair.arbitrage == "none":
+            self.remove(pair.pair_id)
+            return
+
+        i = self._pos.get(pair.pair_id)
+        if i is None:
+            self._heap.append((pair.edge, pair.pair_id, pair))
+            self._pos[pair.pair_id] = len(self._heap) - 1
+            self._sift_up(len(self._heap) - 1)
+            return
+
+        old_edge = self._heap[i][0]
+        self._heap[i] = (pair.edge, pair.pair_id, pair)
+        if pair.edge > old_edge:
+            self._sift_up(i)
+        elif pair.edge < old_edge:
+            self._sift_down(i)
+
+    def remove(self, pair_id):
+        i = self._pos.pop(pair_id, None)
+        if i is None:
+            return
+        last = self._heap.pop()
+        if i == len(self._heap):
+            return
+        self._heap[i] = last
+        self._pos[last[1]] = i
+        self._sift_up(i)
+        self._sift_down(self._pos[last[1]])
+
+    def sync(self, pairs):
+        # brings the ranking in line with a full pair list, only moved pairs touch the heap
+        current = set()
+        for pair in pairs:
+            current.add(pair.pair_id)
+            i = self._pos.get(pair.pair_id)
+            if i is not None and self._heap[i][2] is pair and self._heap[i][0] == pair.edge:
+                continue
+            self.update(pair)
+        for pair_id in [pid for pid in self._pos if pid not in current]:
+            self.remove(pair_id)
+
+    def best(self):
+        return self._heap[0][2] if self._heap else None
+
+    def top(self, k=None):
+        # top k pairs by descending edge in O(k log k), walking the heap with a frontier
+        k = self.k if k is None else k
+        heap = self._heap
+        out = []
+        frontier = [(-heap[0][0], 0)] if heap else []
+        while frontier and len(out) < k:
+            _, i = heapq.heappop(frontier)
+            out.append(heap[i][2])
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (-heap[child][0], child))
+        return out
+
+    def _swap(self, i, j):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._pos[heap[i][1]] = i
+        self._pos[heap[j][1]] = j
+
+    def _sift_up(self, i):
+        heap = self._heap
+        while i > 0:
+            parent = (i - 1) // 2
+            if heap[i][0] <= heap[parent][0]:
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i):
+        heap = self._heap
+        n = len(heap)
+        while True:
+            largest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n and heap[child][0] > heap[largest][0]:
+                    largest = child
+            if largest == i:
+                return
+            self._swap(i, largest)
+            i = largest
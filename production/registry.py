@@ -0,0 +1,181 @@
+from collections import OrderedDict
+from pair_registry import market_key
+import time
+
+# market registry keyed by each venue's stable id (market_key: kalshi ticker,
+# poly market id), with secondary indexes by exchange, series, event, close
+# bucket and title. extractors, the engine and the matcher all store markets
+# in it, so ingest updates and pair lookups are O(1) and two markets sharing a
+# display title no longer overwrite each other.
+#
+# markets are evicted once they are past their close time or in a terminal
+# status, so a daemon's universe tracks what is actually listed.
+# LRURegistry caps metadata (series titles, event -> series) at a fixed size,
+# least recently used first.
+
+# markets stay this many seconds past close_ts before they are evicted
+EXPIRY_GRACE = 3600
+CLOSED_STATUSES = frozenset({"closed", "settled", "finalized", "determined"})
+METADATA_LRU_SIZE = 50000
+# width of the close time buckets in the close index
+CLOSE_BUCKET = 3600
+
+
+def is_expired(market, now, grace=EXPIRY_GRACE):
+    if market.status in CLOSED_STATUSES:
+        return True
+    return market.close_ts is not None and market.close_ts + grace < now
+
+
+def series_of(market):
+    # kalshi event tickers start with their series ticker, poly has no series
+    if market.exchange == "kalshi" and market.event_id:
+        return market.event_id.split("-")[0]
+    return ""
+
+
+class MarketRegistry:
+    def __init__(self, grace=EXPIRY_GRACE, close_bucket=CLOSE_BUCKET):
+        self.grace = grace
+        self.close_bucket = close_bucket
+        self.evictions = 0
+        self._markets = {}
+        self._by_exchange = {}
+        self._by_series = {}
+        self._by_event = {}
+        self._by_close = {}
+        self._by_title = {}
+
+    def __len__(self):
+        return len(self._markets)
+
+    def __contains__(self, key):
+        return key in self._markets
+
+    def __iter__(self):
+        return iter(self._markets)
+
+    def __getitem__(self, key):
+        return self._markets[key]
+
+    def get(self, key, default=None):
+        return self._markets.get(key, default)
+
+    def keys(self):
+        return self._markets.keys()
+
+    def values(self):
+        return self._markets.values()
+
+    def items(self):
+        return self._markets.items()
+
+    def _index_keys(self, market):
+        bucket = None if market.close_ts is None else int(market.close_ts // self.close_bucket)
+        return ((self._by_exchange, market.exchange), (self._by_series, series_of(market)),
+                (self._by_event, market.event_id), (self._by_close, bucket),
+                (self._by_title, market.title))
+
+    def add(self, market):
+        # inserts or replaces the market stored under its id
+        key = market_key(market)
+        self.remove(key)
+        self._markets[key] = market
+        for index, value in self._index_keys(market):
+            if value not in (None, ""):
+                index.setdefault(value, set()).add(key)
+        return key
+
+    def add_live(self, market, now=None):
+        # add for ingest. an expired market is not stored and drops any older
+        # record under its id, so a closed market still listed isn't re-added
+        # and evicted again every cycle
+        now = time.time() if now is None else now
+        if is_expired(market, now, self.grace):
+            self.remove(market_key(market))
+            return None
+        return self.add(market)
+
+    def remove(self, key):
+        market = self._markets.pop(key, None)
+        if market is None:
+            return None
+        for index, value in self._index_keys(market):
+            keys = index.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[value]
+        return market
+
+    def _lookup(self, index, value):
+        return [self._markets[key] for key in index.get(value, ())]
+
+    def for_exchange(self, exchange):
+        # key -> market for one venue, the shape the matcher and snapshots take
+        return {key: self._markets[key] for key in self._by_exchange.get(exchange, ())}
+
+    def by_title(self, title):
+        return self._lookup(self._by_title, title)
+
+    def for_event(self, event_id):
+        return self._lookup(self._by_event, event_id)
+
+    def for_series(self, series_ticker):
+        return self._lookup(self._by_series, series_ticker)
+
+    def closing_between(self, start_ts, end_ts):
+        markets = []
+        for bucket in range(int(start_ts // self.close_bucket),
+                            int(end_ts // self.close_bucket) + 1):
+            markets.extend(m for m in self._lookup(self._by_close, bucket)
+                           if start_ts <= m.close_ts <= end_ts)
+        return markets
+
+    def evict_expired(self, now=None, exchange=None):
+        # removes and returns every expired market, optionally of one venue only
+        now = time.time() if now is None else now
+        keys = self._markets if exchange is None else self._by_exchange.get(exchange, ())
+        expired = [key for key in keys if is_expired(self._markets[key], now, self.grace)]
+        evicted = [self.remove(key) for key in expired]
+        self.evictions += len(evicted)
+        return evicted
+
+    def stats(self):
+        return {"size": len(self), "evictions": self.evictions,
+                "events": len(self._by_event), "series": len(self._by_series)}
+
+
+class LRURegistry(OrderedDict):
+    # maxsize None keeps every entry, like a plain dict
+    def __init__(self, maxsize=METADATA_LRU_SIZE):
+        super().__init__()
+        self.maxsize = maxsize
+        self.evictions = 0
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if self.maxsize is not None:
+            while len(self) > self.maxsize:
+                self.popitem(last=False)
+                self.evictions += 1
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def stats(self):
+        return {"size": len(self), "evictions": self.evictions}
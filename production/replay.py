@@ -0,0 +1,125 @@
+from matching_engine import ComplexMatcher, CLOSE_WINDOW, STRIKE_TOLERANCE
+from snapshot import SnapshotReader, list_snapshots, SNAPSHOT_DIR
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import argparse
+import os
+import time
+
+
+def snapshot_ts(path):
+    # markets-20251230T150000123456.snap -> epoch seconds
+    stamp = os.path.basename(path)[len("markets-"):].split(".")[0]
+    return datetime.strptime(stamp, "%Y%m%dT%H%M%S%f").replace(
+        tzinfo=timezone.utc).timestamp()
+
+
+def iter_snapshots(paths):
+    for path in paths:
+        with SnapshotReader(path) as reader:
+            kalshi_ttm, poly_ttm = reader.markets()
+        yield snapshot_ts(path), kalshi_ttm, poly_ttm
+
+
+class EdgeTracker:
+    # turns per-snapshot arb pairs into edge episodes: first seen, last seen, peak edge
+    def __init__(self):
+        self.open = {}
+        self.closed = []
+
+    def update(self, ts, arb_pairs):
+        seen = set()
+        for pair in arb_pairs:
+            seen.add(pair.pair_id)
+            episode = self.open.get(pair.pair_id)
+            if episode is None:
+                self.open[pair.pair_id] = {"pair_id": pair.pair_id, "start": ts, "end": ts,
+                                           "peak_edge": pair.edge}
+            else:
+                episode["end"] = ts
+                episode["peak_edge"] = max(episode["peak_edge"], pair.edge)
+
+        for pair_id in list(self.open):
+            if pair_id not in seen:
+                self.closed.append(self.open.pop(pair_id))
+
+    def episodes(self):
+        return self.closed + list(self.open.values())
+
+
+def replay(paths, close_window=CLOSE_WINDOW, tolerance_pct=STRIKE_TOLERANCE):
+    # streams snapshots through Formatter, ComplexMatcher and the arb scorer
+    matcher = ComplexMatcher(close_window, tolerance_pct, write_snapshots=False)
+    matcher.enable_logs = False
+    tracker = EdgeTracker()
+    pair_counts = []
+
+    for ts, kalshi_ttm, poly_ttm in iter_snapshots(paths):
+        pair_list = matcher.get_matching_pairs(poly_ttm, kalshi_ttm)
+        arb_pairs = [pair for pair in pair_list if pair.arbitrage != "none"]
+        tracker.update(ts, arb_pairs)
+        pair_counts.append((ts, len(pair_list), len(arb_pairs)))
+
+    episodes = tracker.episodes()
+    durations = [e["end"] - e["start"] for e in episodes]
+    return {
+        "close_window": close_window,
+        "tolerance_pct": tolerance_pct,
+        "snapshots": len(pair_counts),
+        "pair_counts": pair_counts,
+        "episodes": episodes,
+        "mean_pairs": sum(c for _, c, _ in pair_counts) / len(pair_counts) if pair_counts else 0.0,
+        "mean_duration": sum(durations) / len(durations) if durations else 0.0,
+        "max_duration": max(durations) if durations else 0.0,
+    }
+
+
+def _replay_params(args):
+    paths, close_window, tolerance_pct = args
+    return replay(paths, close_window, tolerance_pct)
+
+
+def sweep(paths, close_windows, tolerances, workers=None):
+    # one worker process per parameter set, each maps the snapshots itself
+    grid = [(paths, w, t) for w in close_windows for t in tolerances]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_replay_params, grid))
+
+
+def print_report(results, baseline=None):
+    baseline = baseline or results[0]
+    print(f"{'window_h':>9} {'tol':>7} {'pairs':>9} {'d_pairs':>8} {'edges':>6} "
+          f"{'mean_dur_s':>11} {'max_dur_s':>10}")
+    for r in results:
+        delta = r["mean_pairs"] - baseline["mean_pairs"]
+        print(f"{r['close_window'] / 3600:>9.2f} {r['tolerance_pct']:>7.4f} {r['mean_pairs']:>9.1f} "
+              f"{delta:>+8.1f} {len(r['episodes']):>6} {r['mean_duration']:>11.1f} "
+              f"{r['max_duration']:>10.1f}")
+
+
+def _floats(s):
+    return [float(v) for v in s.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="replay stored market snapshots through the matcher")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR)
+    parser.add_argument("--close-window-hours", default=str(CLOSE_WINDOW / 3600),
+                        help="comma separated list to sweep")
+    parser.add_argument("--tolerance", default=str(STRIKE_TOLERANCE),
+                        help="comma separated list to sweep")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    paths = list_snapshots(args.dir)
+    if not paths:
+        print(f"[ERROR] No snapshots found in {args.dir}")
+        raise SystemExit(1)
+
+    start = time.perf_counter()
+    results = sweep(paths, [h * 3600 for h in _floats(args.close_window_hours)],
+                    _floats(args.tolerance), args.workers)
+    print(f"replayed {len(paths)} snapshots x {len(results)} parameter sets "
+          f"in {time.perf_counter() - start:.2f}s")
+    print_report(results)
@@ -0,0 +1,249 @@
+from format import Market
+from pair_registry import market_key
+from dataclasses import fields
+from datetime import datetime, timezone
+import mmap
+import os
+import struct
+import threading
+import time
+
+# binary columnar snapshot of the formatted market universe.
+#
+# layout (little endian):
+#   header   magic(8s) version(I) n_rows(I) n_cols(I)
+#   columns  n_cols x name(24s) kind(B) offset(Q) nbytes(Q)
+#   data     each column 8 byte aligned
+# float columns are raw float64 arrays with NaN for None, so a reader can
+# cast the mapped bytes directly. string columns are n_rows + 1 uint64
+# offsets followed by the utf-8 blob.
+
+SNAPSHOT_MAGIC = b"PKSNAP\x00\x01"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DIR = os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "snapshots")
+# hours a snapshot is kept, the newest one is always kept for warm starts
+SNAPSHOT_RETENTION = 24
+SNAPSHOT_SUFFIX = ".snap"
+# seconds before a leftover .tmp from an interrupted write is removed
+STALE_TMP_AGE = 300
+
+_HEADER = struct.Struct("<8sIII")
+_COLUMN = struct.Struct("<24sBQQ")
+FLOAT = 0
+STR = 1
+
+_NAN = float("nan")
+COLUMNS = [(f.name, FLOAT if f.type is float else STR)
+           for f in fields(Market) if f.type in (float, str)]
+
+
+def _pad(n):
+    return (8 - n % 8) % 8
+
+
+def encode_columns(n_rows, columns):
+    # [(name, kind, values)] -> column file bytes, shared with history.py
+    blocks = []
+    for name, kind, values in columns:
+        if kind == FLOAT:
+            data = struct.pack(f"<{n_rows}d", *[
+                _NAN if v is None else float(v) for v in values])
+        else:
+            encoded = [("" if v is None else str(v)).encode("utf-8")
+                       for v in values]
+            offsets = [0]
+            for e in encoded:
+                offsets.append(offsets[-1] + len(e))
+            data = struct.pack(f"<{n_rows + 1}Q", *offsets) + b"".join(encoded)
+        blocks.append((name, kind, data))
+
+    offset = _HEADER.size + _COLUMN.size * len(blocks)
+    offset += _pad(offset)
+    directory = []
+    body = []
+    for name, kind, data in blocks:
+        directory.append(_COLUMN.pack(
+            name.encode("ascii"), kind, offset, len(data)))
+        body.append(data + b"\x00" * _pad(len(data)))
+        offset += len(data) + _pad(len(data))
+
+    head = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+                        n_rows, len(blocks)) + b"".join(directory)
+    return head + b"\x00" * _pad(len(head)) + b"".join(body)
+
+
+def encode_markets(markets):
+    # list of Market -> snapshot bytes
+    return encode_columns(len(markets), [
+        (name, kind, [getattr(m, name) for m in markets]) for name, kind in COLUMNS])
+
+
+class ColumnBuffer:
+    # parses column file bytes from any buffer, float columns are zero-copy views
+    def __init__(self, buffer):
+        self._view = memoryview(buffer)
+        magic, version, self.n_rows, n_cols = _HEADER.unpack_from(buffer, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            self._view.release()
+            raise ValueError("buffer is not a column file")
+
+        self._columns = {}
+        for i in range(n_cols):
+            name, kind, offset, nbytes = _COLUMN.unpack_from(
+                buffer, _HEADER.size + i * _COLUMN.size)
+            self._columns[name.rstrip(b"\x00").decode("ascii")] = (
+                kind, offset, nbytes)
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def column(self, name):
+        # float columns come back as a float64 memoryview, string columns as a list
+        kind, offset, nbytes = self._columns[name]
+        if kind == FLOAT:
+            return self._view[offset:offset + nbytes].cast("d")
+        offsets = self._view[offset:offset + 8 * (self.n_rows + 1)].cast("Q")
+        blob = offset + 8 * (self.n_rows + 1)
+        return [bytes(self._view[blob + offsets[i]:blob + offsets[i + 1]]).decode("utf-8")
+                for i in range(self.n_rows)]
+
+    def values(self, name):
+        # like column() but floats are copied into a list with None for NaN
+        kind = self._columns[name][0]
+        values = self.column(name)
+        if kind == FLOAT:
+            return [None if v != v else v for v in values]
+        return values
+
+    def release(self):
+        self._view.release()
+
+
+class SnapshotWriter:
+    # persists formatted markets on a background thread so the matcher never waits on disk.
+    # only the latest universe is worth writing, so a write replaces any still pending
+    def __init__(self, directory=SNAPSHOT_DIR, retention=SNAPSHOT_RETENTION):
+        self.directory = directory
+        self.retention = retention
+        self._cond = threading.Condition()
+        self._pending = None
+        self._busy = False
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="snapshot-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, kalshi_market_ttm, poly_market_ttm):
+        # only the record lists are copied on the caller's thread
+        markets = list(kalshi_market_ttm.values()) + \
+            list(poly_market_ttm.values())
+        with self._cond:
+            self._pending = markets
+            self._cond.notify_all()
+
+    def flush(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending is None and not self._busy)
+
+    def close(self):
+        # writes what is pending, then stops the thread
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._closed)
+                markets, self._pending = self._pending, None
+                if markets is None:
+                    return
+                self._busy = True
+            try:
+                self._write_file(markets)
+                self._rotate()
+            except OSError as e:
+                print(f"[ERROR] Failed to write snapshot: {e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _write_file(self, markets):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        path = os.path.join(self.directory, f"markets-{stamp}{SNAPSHOT_SUFFIX}")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(encode_markets(markets))
+        os.replace(tmp, path)
+        return path
+
+    def _rotate(self):
+        # drops snapshots older than the retention and tmp files left by interrupted writes
+        now = time.time()
+        if self.retention:
+            cutoff = now - self.retention * 3600
+            for path in list_snapshots(self.directory)[:-1]:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp") and os.path.getmtime(path) < now - STALE_TMP_AGE:
+                os.remove(path)
+
+
+def list_snapshots(directory=SNAPSHOT_DIR):
+    # oldest first, file names sort by timestamp
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(name for name in os.listdir(directory)
+                   if name.endswith(SNAPSHOT_SUFFIX))
+    return [os.path.join(directory, name) for name in names]
+
+
+def latest_snapshot(directory=SNAPSHOT_DIR):
+    paths = list_snapshots(directory)
+    return paths[-1] if paths else None
+
+
+class SnapshotReader(ColumnBuffer):
+    # memory maps a snapshot so it loads without reading or parsing the whole file
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            super().__init__(self._mmap)
+        except ValueError:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a market snapshot")
+
+    def markets(self):
+        # rebuilds (kalshi_market_ttm, poly_market_ttm) keyed by market_key
+        cols = {name: self.values(name)
+                for name, _ in COLUMNS if name in self._columns}
+
+        kalshi_market_ttm = {}
+        poly_market_ttm = {}
+        for i in range(self.n_rows):
+            market = Market(**{name: values[i]
+                            for name, values in cols.items()})
+            if market.exchange == "kalshi":
+                kalshi_market_ttm[market_key(market)] = market
+            else:
+                poly_market_ttm[market_key(market)] = market
+        return kalshi_market_ttm, poly_market_ttm
+
+    def close(self):
+        self.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
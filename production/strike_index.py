@@ -0,0 +1,152 @@
+from bisect import bisect_left, bisect_right, insort
+
+# strike index per close-time bucket.
+#
+# equivalence queries mirror strikes_match below: lb~lb,
+# ub~ub, and lb-only~ub-only across exchanges, each answered by binary search
+# over a sorted strike array.
+
+
+def tolerance_radius(value, tolerance_pct):
+    # any b with |a - b| <= tol * (|a| + |b|) / 2 lies within this distance of a
+    return abs(value) * tolerance_pct / (1 - tolerance_pct / 2)
+
+
+def within_tolerance(val1, val2, tolerance_pct):
+    if val1 == 0 and val2 == 0:
+        return True
+    avg = (abs(val1) + abs(val2)) / 2
+    return abs(val1 - val2) <= avg * tolerance_pct
+
+
+def strikes_match(k_lb, k_ub, p_lb, p_ub, tolerance_pct):
+    # reject pairs where both have no strikes (unrelated markets)
+    if k_lb is None and k_ub is None and p_lb is None and p_ub is None:
+        return False
+
+    # same type matches: lb-lb or ub-ub
+    if k_lb is not None and p_lb is not None:
+        if within_tolerance(k_lb, p_lb, tolerance_pct):
+            return True
+    if k_ub is not None and p_ub is not None:
+        if within_tolerance(k_ub, p_ub, tolerance_pct):
+            return True
+
+    # cross type matches: k_lb ≈ p_ub or k_ub ≈ p_lb (same target, different parsing)
+    if k_lb is not None and p_ub is not None and p_lb is None and k_ub is None:
+        if within_tolerance(k_lb, p_ub, tolerance_pct):
+            return True
+    if k_ub is not None and p_lb is not None and p_ub is None and k_lb is None:
+        if within_tolerance(k_ub, p_lb, tolerance_pct):
+            return True
+
+    return False
+
+
+class StrikeBucket:
+    def __init__(self):
+        self.lbs = []
+        self.ubs = []
+        self.lb_only = []
+        self.ub_only = []
+        self.keys = set()
+
+    def _arrays(self, market):
+        arrays = []
+        if market.strike_lb is not None:
+            arrays.append((self.lbs, market.strike_lb))
+            if market.strike_ub is None:
+                arrays.append((self.lb_only, market.strike_lb))
+        if market.strike_ub is not None:
+            arrays.append((self.ubs, market.strike_ub))
+            if market.strike_lb is None:
+                arrays.append((self.ub_only, market.strike_ub))
+        return arrays
+
+    def add(self, key, market):
+        for array, value in self._arrays(market):
+            insort(array, (value, key))
+        self.keys.add(key)
+
+    def remove(self, key, market):
+        for array, value in self._arrays(market):
+            i = bisect_left(array, (value, key))
+            if i < len(array) and array[i] == (value, key):
+                del array[i]
+        self.keys.discard(key)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def _search(array, value, tolerance_pct, out):
+    radius = tolerance_radius(value, tolerance_pct)
+    lo = bisect_left(array, (value - radius,))
+    hi = bisect_right(array, (value + radius, "\uffff"))
+    for other, key in array[lo:hi]:
+        if other == value or abs(value - other) <= (abs(value) + abs(other)) / 2 * tolerance_pct:
+            out.add(key)
+
+
+class StrikeIndex:
+    # markets of one exchange, bucketed by close time. markets without any
+    # strike are never indexed since they can't strike-match anything
+    def __init__(self, bucket_width, tolerance_pct):
+        self.bucket_width = bucket_width
+        self.tolerance_pct = tolerance_pct
+        self.buckets = {}
+        self.markets = {}
+
+    def __len__(self):
+        return len(self.markets)
+
+    def _bucket_id(self, close_ts):
+        return int(close_ts // self.bucket_width)
+
+    def add(self, key, market):
+        if market.close_ts is None or (market.strike_lb is None and market.strike_ub is None):
+            return
+        self.remove(key)
+        self.markets[key] = market
+        bucket_id = self._bucket_id(market.close_ts)
+        self.buckets.setdefault(bucket_id, StrikeBucket()).add(key, market)
+
+    def remove(self, key):
+        market = self.markets.pop(key, None)
+        if market is None:
+            return
+        bucket_id = self._bucket_id(market.close_ts)
+        bucket = self.buckets[bucket_id]
+        bucket.remove(key, market)
+        if not len(bucket):
+            del self.buckets[bucket_id]
+
+    def _near_buckets(self, close_ts, close_window):
+        # every bucket that can hold a close time within close_window of close_ts
+        first = self._bucket_id(close_ts - close_window)
+        last = self._bucket_id(close_ts + close_window)
+        for bucket_id in range(first, last + 1):
+            bucket = self.buckets.get(bucket_id)
+            if bucket is not None:
+                yield bucket
+
+    def _in_window(self, keys, close_ts, close_window):
+        return [key for key in keys
+                if abs(self.markets[key].close_ts - close_ts) <= close_window]
+
+    def equivalent(self, market, close_window):
+        # keys whose strikes match market's within tolerance and close within the window
+        if market.close_ts is None:
+            return []
+        lb, ub = market.strike_lb, market.strike_ub
+        keys = set()
+        for bucket in self._near_buckets(market.close_ts, close_window):
+            if lb is not None:
+                _search(bucket.lbs, lb, self.tolerance_pct, keys)
+                if ub is None:
+                    _search(bucket.ub_only, lb, self.tolerance_pct, keys)
+            if ub is not None:
+                _search(bucket.ubs, ub, self.tolerance_pct, keys)
+                if lb is None:
+                    _search(bucket.lb_only, ub, self.tolerance_pct, keys)
+        return self._in_window(keys, market.close_ts, close_window)
@@ -0,0 +1,197 @@
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+import random
+import requests
+import threading
+import time
+
+# shared http transport for both extractors: pooled connections, retries with
+# jittered backoff that honour Retry-After as sent, per endpoint circuit
+# breakers and optional hedged requests
+
+REQUEST_TIMEOUT = 10
+# sized for the extractors plus the hedging and bulk prefetch threads
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 8.0
+# longest Retry-After waited out, a longer one returns the throttled response
+RETRY_AFTER_MAX = 300.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+BREAKER_FAILURES = 5
+BREAKER_RESET = 30.0
+
+HEDGE_DELAY = 0.3
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    pass
+
+
+class CircuitBreaker:
+    # closed -> open after consecutive failures, half open again after reset_timeout
+    def __init__(self, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        return self.state != "open"
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+def retry_after_seconds(response):
+    # Retry-After is either delta seconds or an http date
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def endpoint_key(url):
+    # /events/KXBTC-25DEC and /events/KXETH-25DEC share a breaker
+    parts = urlsplit(url)
+    segments = [s for s in parts.path.split("/") if s]
+    if len(segments) > 1 and any(c.isdigit() for c in segments[-1]):
+        segments[-1] = "{id}"
+    return parts.netloc + "/" + "/".join(segments)
+
+
+class Transport:
+    def __init__(self, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 retry_after_max=RETRY_AFTER_MAX, pool_connections=POOL_CONNECTIONS,
+                 pool_maxsize=POOL_MAXSIZE, hedge_delay=HEDGE_DELAY, breaker_failures=BREAKER_FAILURES,
+                 breaker_reset=BREAKER_RESET):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.hedge_delay = hedge_delay
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self.breakers = {}
+        self._hedge_pool = None
+        self._lock = threading.Lock()
+
+    def breaker(self, url):
+        key = endpoint_key(url)
+        with self._lock:
+            if key not in self.breakers:
+                self.breakers[key] = CircuitBreaker(
+                    self.breaker_failures, self.breaker_reset)
+            return self.breakers[key]
+
+    def backoff(self, attempt, response=None):
+        # the server's Retry-After is used as sent, backoff_max only caps our own jitter
+        if response is not None:
+            retry_after = retry_after_seconds(response)
+            if retry_after is not None:
+                return retry_after
+        # full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def get(self, url, params=None, timeout=REQUEST_TIMEOUT, hedge=False):
+        # returns the response once it is not retryable or retries run out, the caller
+        # still calls raise_for_status. connection errors are re-raised after the last retry
+        breaker = self.breaker(url)
+        if not breaker.allow():
+            raise CircuitOpenError(f"circuit open for {endpoint_key(url)}")
+
+        attempt = 0
+        while True:
+            response = None
+            try:
+                if hedge:
+                    response = self._hedged_get(url, params, timeout)
+                else:
+                    response = self.session.get(
+                        url, params=params, timeout=timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                breaker.record_failure()
+                if attempt >= self.max_retries or not breaker.allow():
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    return response
+                # 429 is throttling, not an unhealthy endpoint
+                if response.status_code != 429:
+                    breaker.record_failure()
+                if attempt >= self.max_retries or not breaker.allow():
+                    return response
+
+            delay = self.backoff(attempt, response)
+            if delay > self.retry_after_max:
+                return response
+            time.sleep(delay)
+            attempt += 1
+
+    def _hedged_get(self, url, params, timeout):
+        # sends a duplicate request if the first is slower than hedge_delay, first answer wins
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(
+                    max_workers=POOL_MAXSIZE, thread_name_prefix="hedge")
+        pool = self._hedge_pool
+
+        first = pool.submit(self.session.get, url,
+                            params=params, timeout=timeout)
+        done, _ = wait([first], timeout=self.hedge_delay)
+        if done:
+            return first.result()
+
+        futures = [first, pool.submit(
+            self.session.get, url, params=params, timeout=timeout)]
+        error = None
+        while futures:
+            done, pending = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except requests.exceptions.RequestException as e:
+                    error = e
+            futures = list(pending)
+        raise error
+
+    def close(self):
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        self.session.close()
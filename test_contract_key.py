@@ -0,0 +1,45 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "production"))
+
+from contract_key import ContractKeyer, contract_shape, hash_join
+from format import Formatter, Market
+
+CLOSE_TS = 1767139200.0
+WINDOW = 3 * 3600
+TOLERANCE = 0.005
+
+
+def make_market(exchange, title, lb=None, ub=None):
+    market = Market(title, "crypto", 0.5, 0.5, "", "binary", exchange, lb, ub, "",
+                    market_id=title, close_ts=CLOSE_TS)
+    market.tokens = Formatter().title_tokens(title, (lb, ub))
+    return market
+
+
+def test_above_and_below_at_same_strike_do_not_join():
+    kalshi = make_market("kalshi", "Bitcoin price on Dec 30, 2025? $80,000 or above", lb=80000)
+    poly = make_market("poly", "Will the price of Bitcoin be less than $80,000 on December 30?",
+                       ub=80000)
+    keyer = ContractKeyer(WINDOW, TOLERANCE)
+    assert keyer.key(kalshi) != keyer.key(poly)
+    assert not keyer.same_contract(kalshi, poly)
+    assert hash_join([kalshi], [poly], WINDOW, TOLERANCE) == []
+
+
+def test_same_direction_joins_across_bounds():
+    # poly "reach $X" parses into strike_ub but reads as above
+    kalshi = make_market("kalshi", "How high will Bitcoin get this year? $150,000 or above", lb=150000)
+    poly = make_market("poly", "Will Bitcoin reach $150,000 by December 31, 2025?", ub=150000)
+    assert contract_shape(kalshi) == contract_shape(poly) == ("above", 150000)
+    assert hash_join([kalshi], [poly], WINDOW, TOLERANCE) == [(kalshi, poly)]
+
+
+def test_bound_decides_direction_without_title_wording():
+    title = "Bitcoin price on Dec 30, 2025? $78,000"
+    lower = make_market("kalshi", title, ub=78000)
+    upper = make_market("kalshi", title, lb=78000)
+    assert not any(t.startswith("dir:") for t in lower.tokens)
+    assert contract_shape(lower) == ("below", 78000)
+    assert contract_shape(upper) == ("above", 78000)
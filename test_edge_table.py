@@ -0,0 +1,59 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "production"))
+
+from api_interface import ArbitragePair
+from edge_table import EdgeTable, EdgeTableReader
+
+
+def make_pair(name, edge):
+    return ArbitragePair(name, 0.5, 0.5, "", name, 0.5, 0.5 - edge, "")
+
+
+@pytest.fixture
+def table(request):
+    t = EdgeTable(name=f"pk_test_{os.getpid()}_{request.node.name[:20]}", capacity=3)
+    yield t
+    t.close()
+
+
+def read(table):
+    with EdgeTableReader(table.name) as reader:
+        _, _, rows = reader.read()
+    return {row.pair_id: round(row.edge, 6) for row in rows}
+
+
+def test_publish_and_read(table):
+    table.publish([make_pair("a", 0.01), make_pair("b", 0.03), make_pair("c", 0.0)])
+    assert read(table) == {"a|a": 0.01, "b|b": 0.03}
+
+    table.update(make_pair("a", 0.02))
+    table.remove("b|b")
+    assert read(table) == {"a|a": 0.02}
+    assert len(table) == 1
+
+
+def test_publish_keeps_best_edges_when_over_capacity(table):
+    table.publish([make_pair(name, edge) for name, edge in
+                   (("a", 0.01), ("b", 0.04), ("c", 0.02), ("d", 0.03))])
+    assert read(table) == {"b|b": 0.04, "d|d": 0.03, "c|c": 0.02}
+    assert table.dropped == 1
+
+
+def test_update_evicts_lowest_edge_when_full(table):
+    table.publish([make_pair("a", 0.02), make_pair("b", 0.01), make_pair("c", 0.03)])
+    table.update(make_pair("d", 0.05))
+    assert read(table) == {"a|a": 0.02, "c|c": 0.03, "d|d": 0.05}
+
+    # lower than every row, dropped
+    table.update(make_pair("e", 0.005))
+    assert "e|e" not in read(table)
+    assert table.dropped == 2
+
+
+def test_existing_segment_is_not_reused(table):
+    with pytest.raises(FileExistsError):
+        EdgeTable(name=table.name, capacity=3)
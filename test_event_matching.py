@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "production"))
+
+from event_matching import group_by_event, pair_events
+from format import Formatter, Market
+
+CLOSE_TS = 1857600000.0
+WINDOW = 3 * 3600
+
+
+def make_market(exchange, title, event_id):
+    market = Market(title, "politics", 0.5, 0.5, "", "binary", exchange, None, None, "",
+                    market_id=title, event_id=event_id, close_ts=CLOSE_TS)
+    market.tokens = Formatter().title_tokens(title)
+    return market
+
+
+def test_events_without_asset_or_direction_pair_on_title_words():
+    kalshi = group_by_event([
+        make_market("kalshi", "Who will win the 2028 presidential election? Democratic party", "KXPRES-28"),
+        make_market("kalshi", "Who will win the 2028 presidential election? Republican party", "KXPRES-28"),
+    ])
+    poly = group_by_event([
+        make_market("poly", "Will a Democrat win the 2028 presidential election?", "p1"),
+        make_market("poly", "Will a Republican win the 2028 presidential election?", "p1"),
+        make_market("poly", "Will the Lakers win the 2028 NBA finals?", "p2"),
+    ])
+    assert not kalshi[0].tokens and not poly[0].tokens
+
+    pairs = pair_events(kalshi, poly, WINDOW)
+    assert [(k.event_id, p.event_id) for k, p in pairs] == [("KXPRES-28", "p1")]
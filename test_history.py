@@ -0,0 +1,72 @@
+import dataclasses
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "production"))
+
+from engine import Engine
+from format import Market
+from history import HistoryStore
+from ingest import MarketDelta
+from output import Output
+
+
+def quote(market_id, yes):
+    return Market(market_id, "", yes, 1 - yes, "", "", "kalshi", None, None, "",
+                  market_id=market_id)
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = HistoryStore(str(tmp_path), chunk_rows=3, flush_interval=3600)
+    yield s
+    s.close()
+
+
+def test_append_and_query(store):
+    for ts in range(10):
+        store.record_quote(quote("A" if ts % 2 else "B", ts / 100), ts=float(ts))
+    store.flush()
+
+    assert len(store.quotes.chunks) == 4
+    assert [row["ts"] for row in store.query_quotes(market_id="A")] == [1.0, 3.0, 5.0, 7.0, 9.0]
+    assert [row["ts"] for row in store.query_quotes(3.0, 5.0)] == [3.0, 4.0, 5.0]
+    rows = store.query_quotes(2.0, 6.0, market_id="B")
+    assert [(row["ts"], row["yes_price"]) for row in rows] == [(2.0, 0.02), (4.0, 0.04), (6.0, 0.06)]
+
+
+def test_indexes_survive_reopen(store, tmp_path):
+    for ts in range(4):
+        store.record_quote(quote("A", 0.5), ts=float(ts))
+    store.close()
+
+    reopened = HistoryStore(str(tmp_path), chunk_rows=3, flush_interval=3600)
+    assert len(reopened.query_quotes(market_id="A")) == 4
+    reopened.close()
+
+
+def test_engine_records_only_published_edges(tmp_path):
+    e = Engine(output=Output([]))
+    e.complex_matcher.snapshot_writer.close()
+    e.complex_matcher.snapshot_writer = None
+    e.history.close()
+    e.history = HistoryStore(str(tmp_path), flush_interval=3600)
+
+    k = Market("k", "", 0.3, 0.6, "", "", "kalshi", 5.0, None, "", "K1", "", 1000.0)
+    p = Market("p", "", 0.4, 0.5, "", "", "poly", 5.0, None, "", "P1", "", 1000.0)
+
+    def cycle(kalshi_delta, poly_delta):
+        e.kalshi_delta, e.poly_delta = kalshi_delta, poly_delta
+        e.get_matching_markets()
+        e.history.flush()
+        return [row["arbitrage"] for row in e.history.query_edges()]
+
+    assert len(cycle(MarketDelta(added=[k]), MarketDelta(added=[p]))) == 1
+    # nothing changed, nothing recorded
+    assert len(cycle(MarketDelta(), MarketDelta())) == 1
+    assert len(cycle(MarketDelta(changed=[dataclasses.replace(k, yes_price=0.2)]),
+                     MarketDelta())) == 2
+    assert cycle(MarketDelta(removed=[k]), MarketDelta())[-1] == "removed"
+    e.close()
@@ -0,0 +1,78 @@
+import dataclasses
+import json
+import os
+import sys
+
+import pytest
+
+PRODUCTION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "production")
+sys.path.insert(0, PRODUCTION)
+
+from format import Formatter, Market
+from ingest import MarketDelta
+from matching_engine import ComplexMatcher
+
+
+def load(name, scale):
+    # fixture market ttm, kalshi prices are stored in cents
+    formatter = Formatter()
+    with open(os.path.join(PRODUCTION, name)) as f:
+        raw = json.load(f)
+    markets = {}
+    for key, fields in raw.items():
+        fields["yes_price"] /= scale
+        fields["no_price"] /= scale
+        market = Market(**fields)
+        market.close_ts = formatter.parse_close_ts(market.close_time)
+        markets[key] = market
+    return markets
+
+
+@pytest.fixture
+def universe():
+    return (load("kalshi_market_ttm.json", 100), load("poly_market_ttm.json", 1))
+
+
+def matcher():
+    m = ComplexMatcher()
+    m.enable_logs = False
+    return m
+
+
+def pair_edges(pairs):
+    return sorted((p.pair_id, p.edge) for p in pairs)
+
+
+def test_incremental_matches_full(universe):
+    kalshi, poly = universe
+    full = matcher().get_matching_pairs(poly, kalshi)
+    incremental = matcher().apply_delta(MarketDelta(added=list(kalshi.values())),
+                                        MarketDelta(added=list(poly.values())))
+    assert full
+    assert pair_edges(incremental) == pair_edges(full)
+
+
+def test_deltas_track_full_rematch(universe):
+    kalshi, poly = universe
+    inc = matcher()
+    inc.apply_delta(MarketDelta(added=list(kalshi.values())),
+                    MarketDelta(added=list(poly.values())))
+
+    changed = [dataclasses.replace(m, yes_price=0.5) for m in list(kalshi.values())[:5]]
+    for market in changed:
+        kalshi[market.title] = market
+    removed = poly.pop(next(iter(poly)))
+    pairs = inc.apply_delta(MarketDelta(changed=changed), MarketDelta(removed=[removed]))
+
+    assert pair_edges(pairs) == pair_edges(matcher().get_matching_pairs(poly, kalshi))
+
+
+def test_market_pairs_once_it_gains_prices():
+    kalshi = Market("k", "", None, None, "", "", "kalshi", 5.0, None, "", "K1", "", 1000.0)
+    poly = Market("p", "", 0.4, 0.5, "", "", "poly", 5.0, None, "", "P1", "", 1000.0)
+    inc = matcher()
+    inc.apply_delta(MarketDelta(added=[kalshi]), MarketDelta(added=[poly]))
+    assert len(inc.pair_registry) == 0
+
+    inc.update_quote(dataclasses.replace(kalshi, yes_price=0.3, no_price=0.6))
+    assert len(inc.pair_registry) == 1
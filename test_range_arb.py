@@ -0,0 +1,63 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "production"))
+
+from format import Market
+from range_arb import Ladder, find_range_combinations
+
+CLOSE_TS = 1767139200.0
+WINDOW = 3 * 3600
+
+
+def market(exchange, lb, ub, yes, no=None, event_id=""):
+    title = f"{exchange} {lb} to {ub}"
+    return Market(title, "crypto", yes, 1 - yes if no is None else no, "", "binary", exchange,
+                  lb, ub, "", market_id=title, event_id=event_id, close_ts=CLOSE_TS)
+
+
+def eth_ladder(yes=0.1):
+    # kalshi style: open ends and $50 buckets capped at x + 49.99 around 3000
+    buckets = [market("kalshi", None, 2899.99, yes, event_id="KXETH-26DEC31")]
+    for lb in range(2900, 3150, 50):
+        buckets.append(market("kalshi", float(lb), lb + 49.99, yes, event_id="KXETH-26DEC31"))
+    buckets.append(market("kalshi", 3150.0, None, yes, event_id="KXETH-26DEC31"))
+    return buckets
+
+
+def test_ladder_around_3000_is_one_run():
+    ladder = Ladder(eth_ladder())
+    assert len(ladder.run_bounds) == 1
+    assert ladder.tile(2900.0, 3100.0) == (1, 4)
+    assert ladder.tile(3000.0, None) == (3, 6)
+
+
+def test_tile_rejects_edges_off_a_bucket_boundary():
+    ladder = Ladder(eth_ladder())
+    assert ladder.tile(2925.0, 3100.0) is None
+    assert ladder.tile(2900.0, 3110.0) is None
+
+
+def test_gap_splits_runs():
+    buckets = eth_ladder()
+    del buckets[3]
+    ladder = Ladder(buckets)
+    assert len(ladder.run_bounds) == 2
+    assert ladder.tile(2900.0, 3100.0) is None
+
+
+def test_basket_and_complement_combinations():
+    target = market("poly", 2900.0, 3100.0, 0.3, 0.6)
+    combinations = find_range_combinations(eth_ladder(0.1), [target], WINDOW)
+    by_direction = {c.direction: c for c in combinations}
+    assert set(by_direction) == {"basket", "complement"}
+
+    basket = by_direction["basket"]
+    assert len(basket.buckets) == 4
+    assert abs(basket.cost - (4 * 0.1 + 0.6)) < 1e-9
+
+    complement = by_direction["complement"]
+    assert [m.strike_lb for m in complement.buckets] == [None, 3100.0, 3150.0]
+    assert abs(complement.cost - (3 * 0.1 + 0.3)) < 1e-9
+    assert complement.arbitrage == "complement"
+    assert abs(complement.edge - 0.4) < 1e-9
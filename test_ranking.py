@@ -0,0 +1,60 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "production"))
+
+from api_interface import ArbitragePair
+from ranking import EdgeRanking
+
+
+def make_pair(name, edge):
+    # yes kalshi / no poly costs 1 - edge, the other direction costs exactly 1
+    return ArbitragePair(name, 0.5, 0.5, "", name, 0.5, 0.5 - edge, "")
+
+
+def ranked(ranking):
+    return [p.pair_id for p in ranking.top(len(ranking))]
+
+
+def test_update_and_remove_keep_order():
+    ranking = EdgeRanking()
+    pairs = {name: make_pair(name, edge) for name, edge in
+             (("a", 0.01), ("b", 0.05), ("c", 0.03), ("d", 0.02))}
+    for pair in pairs.values():
+        ranking.update(pair)
+    assert ranked(ranking) == ["b|b", "c|c", "d|d", "a|a"]
+
+    # a moves to the top, b falls below c
+    pairs["a"].update_prices(poly_no_price=0.5 - 0.08)
+    ranking.update(pairs["a"])
+    pairs["b"].update_prices(poly_no_price=0.5 - 0.025)
+    ranking.update(pairs["b"])
+    assert ranked(ranking) == ["a|a", "c|c", "b|b", "d|d"]
+
+    ranking.remove("a|a")
+    # no arbitrage left on d, so it drops out
+    pairs["d"].update_prices(poly_no_price=0.6)
+    ranking.update(pairs["d"])
+    assert ranked(ranking) == ["c|c", "b|b"]
+    assert "d|d" not in ranking
+    assert ranking.best().pair_id == "c|c"
+    assert [p.pair_id for p in ranking.top(1)] == ["c|c"]
+
+
+def test_matches_sorted_list_under_random_updates():
+    rng = random.Random(3)
+    ranking = EdgeRanking()
+    live = {}
+    for _ in range(2000):
+        name = f"p{rng.randrange(60)}"
+        if rng.random() < 0.25:
+            ranking.remove(f"{name}|{name}")
+            live.pop(name, None)
+        else:
+            pair = make_pair(name, rng.randrange(1, 400) / 1000)
+            ranking.update(pair)
+            live[name] = pair
+    expected = sorted(live.values(), key=lambda p: p.edge, reverse=True)
+    assert [p.edge for p in ranking.top(len(live))] == [p.edge for p in expected]
+    assert len(ranking) == len(live)
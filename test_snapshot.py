@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "production"))
+
+from format import Market
+from pair_registry import market_key
+from snapshot import SnapshotReader, SnapshotWriter, encode_markets, latest_snapshot
+
+KALSHI = [
+    Market("Ethereum price on Dec 31? $3,000 or above", "crypto", 0.4, 0.55,
+           "2030-12-31T17:00:00Z", "binary", "kalshi", 3000.0, None,
+           "https://kalshi.com/markets/kxeth", "KXETH-30DEC31-T3000", "KXETH-30DEC31",
+           1924966800.0, "active"),
+    # no quotes yet and no strikes
+    Market("Fed cuts rates in 2030?", "economics", None, None, "", "", "kalshi",
+           None, None, "", "KXFED-30", "KXFED", None, ""),
+]
+POLY = [
+    Market("Will Ethereum be above $3,000 on December 31? — été", "", 0.5, 0.5,
+           "2030-12-31T17:00:00Z", "", "poly", None, 3000.0,
+           "https://polymarket.com/market/eth-3000", "42", "e1",
+           1924966800.0, "open"),
+]
+
+
+def by_key(markets):
+    return {market_key(m): m for m in markets}
+
+
+def test_writer_and_reader_roundtrip(tmp_path):
+    writer = SnapshotWriter(str(tmp_path), retention=1)
+    writer.write(by_key(KALSHI), by_key(POLY))
+    writer.close()
+
+    with SnapshotReader(latest_snapshot(str(tmp_path))) as reader:
+        assert reader.n_rows == 3
+        kalshi_ttm, poly_ttm = reader.markets()
+    assert kalshi_ttm == by_key(KALSHI)
+    assert poly_ttm == by_key(POLY)
+
+
+def test_encoded_markets_read_back(tmp_path):
+    path = tmp_path / "markets-20301231T000000000000.snap"
+    path.write_bytes(encode_markets(POLY + KALSHI))
+    with SnapshotReader(str(path)) as reader:
+        assert reader.values("strike_ub") == [3000.0, None, None]
+        assert reader.values("market_id") == ["42", "KXETH-30DEC31-T3000", "KXFED-30"]
+
+
+def test_reader_rejects_other_files(tmp_path):
+    path = tmp_path / "markets-20301231T000000000000.snap"
+    path.write_bytes(b"not a snapshot at all, just some bytes")
+    with pytest.raises(ValueError):
+        SnapshotReader(str(path))
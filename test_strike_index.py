@@ -0,0 +1,39 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "production"))
+
+from format import Market
+from strike_index import StrikeIndex, strikes_match
+
+WINDOW = 3 * 3600
+TOLERANCE = 0.01
+
+
+def random_market(rng, exchange, i):
+    lb = rng.choice([None, float(rng.randrange(90, 110) * 100)])
+    ub = rng.choice([None, float(rng.randrange(90, 110) * 100)])
+    close_ts = 1767139200.0 + rng.randrange(-12, 12) * 1800
+    return Market(f"{exchange}{i}", "", 0.5, 0.5, "", "", exchange, lb, ub, "",
+                  market_id=f"{exchange}{i}", close_ts=close_ts)
+
+
+def test_equivalent_matches_brute_force():
+    rng = random.Random(7)
+    kalshi = [random_market(rng, "kalshi", i) for i in range(300)]
+    poly = [random_market(rng, "poly", i) for i in range(300)]
+    index = StrikeIndex(WINDOW, TOLERANCE)
+    for market in poly:
+        index.add(market.market_id, market)
+    # removals must leave the buckets consistent
+    for market in poly[::5]:
+        index.remove(market.market_id)
+    indexed = [m for i, m in enumerate(poly) if i % 5 and (m.strike_lb, m.strike_ub) != (None, None)]
+
+    for k in kalshi:
+        expected = sorted(p.market_id for p in indexed
+                          if abs(k.close_ts - p.close_ts) <= WINDOW
+                          and strikes_match(k.strike_lb, k.strike_ub,
+                                            p.strike_lb, p.strike_ub, TOLERANCE))
+        assert sorted(index.equivalent(k, WINDOW)) == expected
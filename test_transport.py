@@ -0,0 +1,115 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "production"))
+
+from transport import CircuitOpenError, Transport
+
+
+class FaultServer:
+    # local http server answering each request with the next scripted
+    # (status, headers, delay), the last entry repeats once the script runs out
+    def __init__(self, script):
+        self.script = list(script)
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server._lock:
+                    status, headers, delay = server.script[min(server.requests, len(server.script) - 1)]
+                    server.requests += 1
+                time.sleep(delay)
+                body = b"{}"
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/markets"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(*script):
+        server = FaultServer(script)
+        servers.append(server)
+        return server
+    yield start
+    for server in servers:
+        server.close()
+
+
+def test_retry_after_is_honoured_past_backoff_max(serve):
+    server = serve((429, {"Retry-After": "1"}, 0), (200, {}, 0))
+    transport = Transport(backoff_max=0.01)
+    started = time.monotonic()
+    response = transport.get(server.url)
+    assert response.status_code == 200
+    assert server.requests == 2
+    assert time.monotonic() - started >= 0.9
+
+
+def test_retry_after_beyond_cap_returns_throttled_response(serve):
+    server = serve((429, {"Retry-After": "600"}, 0), (200, {}, 0))
+    transport = Transport(retry_after_max=60)
+    started = time.monotonic()
+    assert transport.get(server.url).status_code == 429
+    assert server.requests == 1
+    assert time.monotonic() - started < 1
+
+
+def test_5xx_is_retried(serve):
+    server = serve((503, {}, 0), (502, {}, 0), (200, {}, 0))
+    transport = Transport(backoff_base=0.001)
+    assert transport.get(server.url).status_code == 200
+    assert server.requests == 3
+
+
+def test_breaker_opens_then_half_opens(serve):
+    server = serve((500, {}, 0), (500, {}, 0), (200, {}, 0))
+    transport = Transport(max_retries=5, backoff_base=0.001, breaker_failures=2,
+                          breaker_reset=0.2)
+    assert transport.get(server.url).status_code == 500
+    assert server.requests == 2
+    breaker = transport.breaker(server.url)
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        transport.get(server.url)
+    assert server.requests == 2
+
+    time.sleep(0.25)
+    assert breaker.state == "half_open"
+    assert transport.get(server.url).status_code == 200
+    assert breaker.state == "closed"
+
+
+def test_hedged_request_beats_slow_first(serve):
+    server = serve((200, {}, 1.0), (200, {}, 0))
+    transport = Transport(hedge_delay=0.05)
+    started = time.monotonic()
+    assert transport.get(server.url, hedge=True).status_code == 200
+    assert time.monotonic() - started < 0.8
+    assert server.requests == 2
+    transport.close()
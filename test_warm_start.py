@@ -0,0 +1,95 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "production"))
+
+from engine import Engine
+from format import Formatter
+from history import HistoryStore
+from output import Output
+from snapshot import encode_markets
+
+CLOSE_TIME = "2030-12-31T17:00:00Z"
+
+
+def kalshi_raw(strike):
+    return {"ticker": f"KXETH-30DEC31-T{strike}", "title": "Ethereum price on Dec 31, 2030?",
+            "yes_sub_title": f"${strike:,} or above", "yes_ask": 40, "no_ask": 55,
+            "close_time": CLOSE_TIME, "floor_strike": strike,
+            "event_ticker": "KXETH-30DEC31", "status": "active"}
+
+
+def poly_raw(strike):
+    return {"id": str(strike), "question": f"Will the price of Ethereum be above ${strike:,} on December 31?",
+            "outcomePrices": "[\"0.5\", \"0.5\"]", "endDate": CLOSE_TIME, "slug": f"eth-{strike}"}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    e = Engine(output=Output([]))
+    e.complex_matcher.snapshot_writer.close()
+    e.complex_matcher.snapshot_writer = None
+    e.history.close()
+    e.history = HistoryStore(str(tmp_path / "history"))
+    e.range_search = False
+
+    formatter = Formatter()
+    markets = [formatter.format_kalshi_market(kalshi_raw(s)) for s in (3000, 3500)]
+    markets += [formatter.format_poly_market(poly_raw(s), "e1") for s in (3000, 3500)]
+    path = tmp_path / "markets-20301231T000000000000.snap"
+    path.write_bytes(encode_markets(markets))
+    assert e.warm_start(str(path))
+    assert len(e.matching_pairs) == 2
+    yield e
+    e.close()
+
+
+def discover(e, kalshi_strikes, poly_strikes, kalshi_fails=False):
+    # stands in for the network side of get_markets
+    def get_events(tag):
+        events = [{"id": "e1", "markets": [poly_raw(s) for s in poly_strikes]}]
+        with e.lock:
+            for market in e.poly_extractor.ingestor.ingest_poly_events(events):
+                e.markets.add_live(market)
+        return events
+
+    def get_series(category, tag):
+        if kalshi_fails:
+            e.kalshi_extractor.ingestor.mark_incomplete()
+            return []
+        return [{"ticker": "KXETH"}]
+
+    def get_markets_for_series(tickers):
+        with e.lock:
+            markets = e.kalshi_extractor.ingestor.ingest_kalshi_markets(
+                [kalshi_raw(s) for s in kalshi_strikes] if tickers else [])
+            for market in markets:
+                e.markets.add_live(market)
+        return {ticker: markets for ticker in tickers}
+
+    e.poly_extractor.get_events = get_events
+    e.kalshi_extractor.get_series = get_series
+    e.kalshi_extractor.get_markets_for_series = get_markets_for_series
+    e.get_markets(None, None, None)
+    return e.reconcile()
+
+
+def test_reconcile_keeps_rediscovered_markets(engine):
+    pairs = discover(engine, (3000, 3500), (3000, 3500))
+    assert len(pairs) == 2
+    assert engine.warm_markets == {}
+
+
+def test_reconcile_removes_unlisted_markets(engine):
+    pairs = discover(engine, (3000,), (3000, 3500))
+    assert [p.kalshi_id for p in pairs] == ["KXETH-30DEC31-T3000"]
+    assert "kalshi:KXETH-30DEC31-T3500" not in engine.markets
+
+
+def test_partial_fetch_keeps_warm_markets(engine):
+    pairs = discover(engine, (), (3000, 3500), kalshi_fails=True)
+    assert len(pairs) == 2
+    assert "kalshi:KXETH-30DEC31-T3500" in engine.markets
+    assert {m.exchange for m in engine.warm_markets.values()} == {"kalshi"}